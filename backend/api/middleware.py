@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Optional
+import zlib
+from starlette.datastructures import Headers, MutableHeaders # type: ignore
+from starlette.types import ASGIApp, Message, Receive, Scope, Send # type: ignore
+
+try:
+    import brotli # type: ignore
+except ImportError:
+    brotli = None
+
+# Server-sent events must reach the client as they are written, not when a compressor block fills
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """Codings in an Accept-Encoding header mapped to their q-values (1.0 when not given)."""
+    accepted: Dict[str, float] = {}
+    for item in header.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def _choose_encoding(header: str, available: List[str]) -> Optional[str]:
+    """The available coding the client weights highest, earlier ones winning ties; None for identity."""
+    accepted = _accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 writes the gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+
+class _CompressingResponder:
+    """Wraps one response: small or already-encoded bodies pass through, the rest are compressed.
+
+    A body sent in one message gets an exact Content-Length; a streamed body is compressed chunk by
+    chunk with a flush after each, so the client receives every chunk as it is written.
+    """
+
+    def __init__(self, app: ASGIApp, encoding: str, compressor: Any, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.send: Send = None # type: ignore[assignment]
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES)
+            return
+        if message["type"] != "http.response.body" or self.start_message is None:
+            await self.send(message)
+            return
+        if self.passthrough:
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._flush_start()
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compressor.compress(body, final=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self._flush_start()
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+        await self.send({"type": "http.response.body", "body": self.compressor.compress(body, final=not more_body), "more_body": more_body})
+
+    async def _flush_start(self) -> None:
+        if not self.started:
+            self.started = True
+            await self.send(self.start_message) # type: ignore[arg-type]
+
+class CompressionMiddleware:
+    """Compresses responses of at least minimum_size bytes with brotli or gzip, whichever the client weights higher.
+
+    Brotli is offered when the brotli package is installed and wins ties with gzip. Written against
+    the plain ASGI interface so it does not depend on Starlette's internal gzip responders.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.available = (["br"] if brotli is not None else []) + ["gzip"]
+
+    def _compressor(self, encoding: str) -> Any:
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(self.app, encoding, self._compressor(encoding), self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,20 @@
+from typing import Any
+from fastapi.encoders import jsonable_encoder # type: ignore
+from fastapi.responses import JSONResponse, ORJSONResponse as FastAPIORJSONResponse # type: ignore
+
+try:
+    import orjson # type: ignore
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSONResponse = FastAPIORJSONResponse
+else:
+    class ORJSONResponse(JSONResponse): # type: ignore[no-redef]
+        """Stand-in for FastAPI's ORJSONResponse when orjson is not installed.
+
+        Content goes through jsonable_encoder first, so datetimes and models serialize as they do with orjson.
+        """
+
+        def render(self, content: Any) -> bytes:
+            return super().render(jsonable_encoder(content))
@@ -1,6 +1,9 @@
 from fastapi import APIRouter # type: ignore
-from api.v1.endpoints import users, sessions
+from api.v1.endpoints import users, sessions, admin, health, blobs
 
 api_router = APIRouter()
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(sessions.router, prefix="/sessions", tags=["sessions"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
+api_router.include_router(health.router, prefix="/health", tags=["health"])
+api_router.include_router(blobs.router, prefix="/blobs", tags=["blobs"])
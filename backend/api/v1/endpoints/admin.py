@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Request # type: ignore
+from typing import Dict, Any, Optional
+import secrets
+from core import config
+from services import metrics
+from services.indexer import IndexJobRunner
+from schemas.admin import IndexJobStatus, IndexJobList
+
+router = APIRouter()
+
+def get_index_runner_dependency(request: Request) -> IndexJobRunner:
+    runner = getattr(request.app.state, "index_runner", None)
+    if runner is None:
+        # Under prefork only the leader worker runs the indexer; a retry may land on it
+        raise HTTPException(status_code=503, detail="Background indexer is not running in this worker.")
+    return runner
+
+def require_admin_token(authorization: Optional[str] = Header(None)) -> None:
+    """Admits requests carrying "Authorization: Bearer <ADMIN_TOKEN>"; without ADMIN_TOKEN set, nobody."""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin actions are disabled; set ADMIN_TOKEN to enable them.")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token.", headers={"WWW-Authenticate": "Bearer"})
+
+@router.get("/embeddings/stats")
+async def embedding_stats() -> Dict[str, Any]:
+    """Reports the query embedding batcher's queue depth and batch-size histograms."""
+    return metrics.snapshot(prefix="embedding_")
+
+@router.get("/mcp/health")
+async def mcp_health(request: Request) -> Dict[str, Any]:
+    """Reports the connection state of each pooled MCP server session."""
+    pool = getattr(request.app.state, "mcp_pool", None)
+    return pool.health() if pool is not None else {}
+
+@router.post("/ingest", response_model=IndexJobList, status_code=202, dependencies=[Depends(require_admin_token)])
+async def ingest_all_sources(runner: IndexJobRunner = Depends(get_index_runner_dependency)):
+    """Queues an ingestion job for every source in sources.json."""
+    from data.populate_vectors import list_sources
+    jobs = [runner.submit(s["resource_name"]) for s in list_sources()]
+    return IndexJobList(jobs=jobs)
+
+@router.post("/ingest/{resource_name}", response_model=IndexJobStatus, status_code=202, dependencies=[Depends(require_admin_token)])
+async def ingest_source(resource_name: str, runner: IndexJobRunner = Depends(get_index_runner_dependency)):
+    """Queues an ingestion job for one source; the RAG tools are reloaded when it succeeds."""
+    from data.populate_vectors import list_sources
+    if resource_name not in {s["resource_name"] for s in list_sources()}:
+        raise HTTPException(status_code=404, detail="Source not found in sources.json.")
+    return runner.submit(resource_name)
+
+@router.get("/ingest/jobs", response_model=IndexJobList)
+async def list_ingest_jobs(runner: IndexJobRunner = Depends(get_index_runner_dependency)):
+    """Lists ingestion jobs, most recent first."""
+    return IndexJobList(jobs=runner.list_jobs())
+
+@router.get("/ingest/jobs/{job_id}", response_model=IndexJobStatus)
+async def get_ingest_job(job_id: str, runner: IndexJobRunner = Depends(get_index_runner_dependency)):
+    """Reports the progress of one ingestion job."""
+    job = runner.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response # type: ignore
+from fastapi.responses import PlainTextResponse # type: ignore
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import AsyncSessionLocal, get_read_db_session
+from core import config
+from crud import chat as chat_crud
+
+router = APIRouter()
+
+# Content-addressed, so a hash never maps to different code
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+@router.get("/{code_hash}", response_class=PlainTextResponse)
+async def get_code_blob(code_hash: str, request: Request, db: AsyncSession = Depends(get_read_db_session)):
+    """Returns ReactBlock code by the code_hash stored in message content, with the hash as its ETag."""
+    etag = f'"{code_hash}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": IMMUTABLE})
+    blob = await chat_crud.get_code_blob(db, code_hash)
+    if not blob and config.READ_DATABASE_URL:
+        # Blobs are fetched right after the message that references them; the replica may lag
+        async with AsyncSessionLocal() as primary:
+            blob = await chat_crud.get_code_blob(primary, code_hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Code blob not found.")
+    return PlainTextResponse(blob.code, media_type="text/javascript", headers={"ETag": etag, "Cache-Control": IMMUTABLE})
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Request # type: ignore
+from fastapi.responses import JSONResponse # type: ignore
+
+router = APIRouter()
+
+@router.get("/live")
+async def liveness():
+    """Reports that the process is up and serving requests."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """Reports which startup components are up; returns 503 until every critical one is ready."""
+    graph = getattr(request.app.state, "startup", None)
+    if graph is None:
+        return JSONResponse(status_code=503, content={"ready": False, "components": {}})
+    report = graph.readiness()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
@@ -0,0 +1,10 @@
+from fastapi import APIRouter # type: ignore
+from fastapi.responses import PlainTextResponse # type: ignore
+from services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Exposes every registered gauge and histogram in the Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Request # type: ignore # Import Request
+from typing import List, Optional
+import hashlib
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response # type: ignore # Import Request
 from sqlalchemy.ext.asyncio import AsyncSession # type: ignore
 from schemas.chat import SessionCreate, ChatSessionResponse, MessageRequest, MessageResponse, SessionListResponse, ChatMessageResponse
 from crud import chat as chat_crud
 from crud import user as user_crud
-from db.session import get_db_session
-from services.agent import get_agent_response # Removed _agent_executor import
+from db.session import AsyncSessionLocal, get_db_session, get_read_db_session, recent_writes, remember_write
+from services.agent import get_agent_response, AgentBudget # Removed _agent_executor import
 from langchain.agents import AgentExecutor # type: ignore
-from services.message_converter import db_messages_to_lc_messages
+from services.message_converter import history_rows_to_lc_messages
+from core import config
+from api.responses import ORJSONResponse
+from services.tracing import traced, span
+from services.singleflight import SingleFlight
 from langchain_openai import ChatOpenAI
 
 router = APIRouter()
@@ -23,32 +29,52 @@ def get_llm_instance_dependency(request: Request) -> ChatOpenAI:
         raise HTTPException(status_code=503, detail="LLM is not initialized.")
     return llm_instance
 
+# ReactBlock code is stored once in code_blobs. Responses carry it inline as before unless the client
+# asks for react_code=hash, in which case blocks keep only code_hash (served by GET /blobs/{code_hash})
+REACT_CODE_QUERY = Query("inline", pattern="^(inline|hash)$", description="'inline' (default) or 'hash' for ReactBlock code.")
+
+async def _inline_messages(db: AsyncSession, messages: List[ChatMessageResponse]) -> List[ChatMessageResponse]:
+    contents = await chat_crud.inline_react_code(db, [m.content for m in messages])
+    return [m if c is m.content else m.model_copy(update={"content": c}) for m, c in zip(messages, contents)]
+
 @router.post("/", response_model=ChatSessionResponse, status_code=201)
+@traced("create_session")
 async def create_session(
     session_data: SessionCreate, 
+    response: Response,
+    react_code: str = REACT_CODE_QUERY,
     db: AsyncSession = Depends(get_db_session),
     agent_executor: AgentExecutor = Depends(get_agent_executor_dependency),
     llm_instance: ChatOpenAI = Depends(get_llm_instance_dependency)
 ):
     """Starts a new chat session for a user."""
         
-    user = await user_crud.get_user_by_id(db, session_data.user_id)
+    with span("db.load_user"):
+        user = await user_crud.get_user_by_id(db, session_data.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    new_session, _ = await chat_crud.create_chat_session(
-        db, session_data.user_id, session_data.initial_message
-    )
+    with span("db.create_session"):
+        new_session, _ = await chat_crud.create_chat_session(
+            db, session_data.user_id, session_data.initial_message
+        )
     
-    ai_response_content, tool_names_used = await get_agent_response(
-        agent_executor, session_data.initial_message, [], llm_instance
+    ai_response_content, tool_names_used, _ = await get_agent_response(
+        agent_executor, session_data.initial_message, [], llm_instance, user_id=session_data.user_id
     )
     
-    await chat_crud.add_ai_message_to_session(
-        db, new_session.id, ai_response_content, tool_names_used
-    )
+    with span("db.write_ai_message"):
+        await chat_crud.add_ai_message_to_session(
+            db, new_session.id, ai_response_content, tool_names_used
+        )
+    remember_write(response, session_id=new_session.id, user_id=session_data.user_id)
     
-    messages = await chat_crud.get_chat_messages(db, new_session.id)
+    with span("db.load_history"):
+        # Re-read the session so the counters bumped by the AI message insert are current
+        new_session = await chat_crud.get_chat_session(db, new_session.id)
+        messages = [ChatMessageResponse.from_orm(m) for m in await chat_crud.get_chat_messages(db, new_session.id)]
+        if react_code == "inline":
+            messages = await _inline_messages(db, messages)
     
     return ChatSessionResponse(
         id=new_session.id,
@@ -56,67 +82,149 @@ async def create_session(
         title=new_session.title,
         created_at=new_session.created_at,
         updated_at=new_session.updated_at,
-        messages=[ChatMessageResponse.from_orm(m) for m in messages]
+        message_count=new_session.message_count,
+        last_message_preview=new_session.last_message_preview,
+        last_message_at=new_session.last_message_at,
+        messages=messages
     )
 
+_idempotent_sends = SingleFlight("idempotent send_message")
+
 @router.post("/chat", response_model=MessageResponse)
+@traced("send_message")
 async def send_message(
     message_data: MessageRequest, 
+    response: Response,
+    react_code: str = REACT_CODE_QUERY,
     db: AsyncSession = Depends(get_db_session),
     agent_executor: AgentExecutor = Depends(get_agent_executor_dependency),
-    llm_instance: ChatOpenAI = Depends(get_llm_instance_dependency)
+    llm_instance: ChatOpenAI = Depends(get_llm_instance_dependency),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    """Sends a new message to an existing chat session."""
-        
-    session = await chat_crud.get_chat_session(db, message_data.session_id)
+    """Sends a new message to an existing chat session.
+
+    With an Idempotency-Key header, repeats of the same request (double submits, client retries)
+    get the first request's response instead of running the agent again.
+    """
+    if not idempotency_key:
+        result = await _send_message(message_data, db, agent_executor, llm_instance)
+    else:
+        request_hash = hashlib.sha256(message_data.model_dump_json().encode()).hexdigest()
+        # Duplicates arriving while the first is still running in this process just wait for it
+        result = await _idempotent_sends.do(
+            (message_data.user_id, idempotency_key, request_hash),
+            lambda: _send_idempotent(message_data, idempotency_key, request_hash, agent_executor, llm_instance),
+        )
+    remember_write(response, session_id=message_data.session_id, user_id=message_data.user_id)
+    if react_code == "inline":
+        # The result may be shared with coalesced duplicates (and is stored for replays), so copy it
+        ai_response = (await _inline_messages(db, [result.ai_response]))[0]
+        result = result.model_copy(update={"ai_response": ai_response})
+    return result
+
+async def _send_idempotent(message_data: MessageRequest, idempotency_key: str, request_hash: str,
+                           agent_executor: AgentExecutor, llm_instance: ChatOpenAI) -> MessageResponse:
+    # Own session: this task outlives the request that started it when duplicates are waiting on it
+    async with AsyncSessionLocal() as db:
+        existing = await chat_crud.claim_idempotency_key(db, message_data.user_id, idempotency_key, request_hash)
+        if existing is not None:
+            if existing.request_hash != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request.")
+            if existing.response is None:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+            return MessageResponse.model_validate(existing.response)
+        try:
+            response = await _send_message(message_data, db, agent_executor, llm_instance, retryable=True)
+        except BaseException:
+            await chat_crud.release_idempotency_key(db, message_data.user_id, idempotency_key)
+            raise
+        await chat_crud.complete_idempotency_key(db, message_data.user_id, idempotency_key, response.model_dump(mode="json"))
+        return response
+
+async def _send_message(message_data: MessageRequest, db: AsyncSession, agent_executor: AgentExecutor,
+                        llm_instance: ChatOpenAI, retryable: bool = False) -> MessageResponse:
+    """Writes the user message, runs the agent and writes its answer.
+
+    With retryable set (the caller releases its idempotency key on failure), a failure after the
+    user message was written removes it again, so the retry does not record the message twice.
+    """
+    with span("db.load_session"):
+        session = await chat_crud.get_chat_session(db, message_data.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found.")
     
     if session.user_id != message_data.user_id:
         raise HTTPException(status_code=403, detail="Forbidden: User ID does not match session owner.")
         
-    history_records = await chat_crud.get_chat_messages(db, message_data.session_id)
-    lc_history = db_messages_to_lc_messages(history_records)
+    with span("db.load_history") as history_span:
+        history_rows = await chat_crud.get_chat_history(db, message_data.session_id, config.HISTORY_MAX_TOKENS)
+        if history_span:
+            history_span.set(messages=len(history_rows))
+    with span("history.convert"):
+        lc_history = history_rows_to_lc_messages(history_rows)
     
-    user_message = await chat_crud.add_user_message_to_session(
-        db, message_data.session_id, message_data.content
-    )
-    
-    ai_response_content, tool_names_used = await get_agent_response(
-        agent_executor, message_data.content, lc_history, llm_instance # Pass llm_instance here
-    )
+    with span("db.write_user_message"):
+        user_message = await chat_crud.add_user_message_to_session(
+            db, message_data.session_id, message_data.content
+        )
+    recent_writes.mark(session_id=message_data.session_id, user_id=message_data.user_id)
+    user_message_id = user_message.id
     
-    ai_message = await chat_crud.add_ai_message_to_session(
-        db, message_data.session_id, ai_response_content, tool_names_used
-    )
+    try:
+        budget = AgentBudget(message_data.max_iterations, message_data.max_seconds, message_data.max_tokens)
+        ai_response_content, tool_names_used, budget_usage = await get_agent_response(
+            agent_executor, message_data.content, lc_history, llm_instance, budget, # Pass llm_instance here
+            user_id=message_data.user_id
+        )
+        
+        with span("db.write_ai_message"):
+            ai_message = await chat_crud.add_ai_message_to_session(
+                db, message_data.session_id, ai_response_content, tool_names_used
+            )
+    except BaseException:
+        if retryable:
+            await db.rollback()
+            await chat_crud.remove_message(db, message_data.session_id, user_message_id)
+        raise
+    recent_writes.mark(session_id=message_data.session_id, user_id=message_data.user_id)
     
     return MessageResponse(
         session_id=message_data.session_id,
         user_message=ChatMessageResponse.from_orm(user_message),
         ai_response=ChatMessageResponse.from_orm(ai_message),
-        tool_names_used=tool_names_used
+        tool_names_used=tool_names_used,
+        budget=budget_usage
     )
 
 @router.get("/{session_id}", response_model=ChatSessionResponse)
-async def get_session(session_id: str, db: AsyncSession = Depends(get_db_session)):
+async def get_session(session_id: str, db: AsyncSession = Depends(get_read_db_session), react_code: str = REACT_CODE_QUERY):
     """Retrieves a specific chat session and all its messages."""
     session = await chat_crud.get_chat_session(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found.")
         
-    messages = await chat_crud.get_chat_messages(db, session_id)
+    messages = await chat_crud.get_chat_message_dicts(db, session_id)
+    if react_code == "inline":
+        contents = await chat_crud.inline_react_code(db, [m["content"] for m in messages])
+        for message, content in zip(messages, contents):
+            message["content"] = content
     
-    return ChatSessionResponse(
-        id=session.id,
-        user_id=session.user_id,
-        title=session.title,
-        created_at=session.created_at,
-        updated_at=session.updated_at,
-        messages=[ChatMessageResponse.from_orm(m) for m in messages]
-    )
+    # Long sessions are the heaviest read: build the ChatSessionResponse shape directly and let
+    # orjson serialize it, instead of validating a Pydantic model per message
+    return ORJSONResponse({
+        "id": session.id,
+        "user_id": session.user_id,
+        "title": session.title,
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+        "message_count": session.message_count,
+        "last_message_preview": session.last_message_preview,
+        "last_message_at": session.last_message_at,
+        "messages": messages,
+    })
 
 @router.get("/user/{user_id}", response_model=SessionListResponse)
-async def list_user_sessions(user_id: int, db: AsyncSession = Depends(get_db_session)):
+async def list_user_sessions(user_id: int, db: AsyncSession = Depends(get_read_db_session)):
     """Lists all chat sessions for a specific user."""
     sessions = await chat_crud.get_user_sessions(db, user_id)
     return SessionListResponse(
@@ -127,6 +235,9 @@ async def list_user_sessions(user_id: int, db: AsyncSession = Depends(get_db_ses
                 title=s.title,
                 created_at=s.created_at,
                 updated_at=s.updated_at,
+                message_count=s.message_count,
+                last_message_preview=s.last_message_preview,
+                last_message_at=s.last_message_at,
                 messages=[]
             ) for s in sessions
         ]
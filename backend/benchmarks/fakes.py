@@ -0,0 +1,123 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+import asyncio
+import hashlib
+import json
+import time
+import numpy as np # type: ignore
+from langchain_core.embeddings import Embeddings # type: ignore
+from langchain_core.language_models.chat_models import BaseChatModel # type: ignore
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage # type: ignore
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult # type: ignore
+from langchain_core.utils.function_calling import convert_to_openai_tool # type: ignore
+
+FILLER_WORDS = ("the", "agent", "found", "relevant", "results", "for", "this", "question", "in", "sources")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for ChatOpenAI with a fixed tool-calling script and simulated latency.
+
+    A turn goes: the agent call after a user message asks for up to `tool_calls_per_turn` tools
+    (matching `tool_patterns` in order); the call after tool results answers with `response_tokens`
+    words; a structured-output call returns one text block; a plain prompt (the RAG answer) gets a
+    short completion. Latency is `first_token_ms` plus `per_token_ms` for each generated token.
+    """
+
+    first_token_ms: float = 200.0
+    per_token_ms: float = 5.0
+    response_tokens: int = 80
+    tool_calls_per_turn: int = 2
+    tool_patterns: Sequence[str] = ("RAG_", "search_")
+    model_name: str = "scripted-fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _text(self, n_tokens: int) -> str:
+        return " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(n_tokens))
+
+    def _pick_tools(self, tool_names: List[str]) -> List[str]:
+        picked: List[str] = []
+        for pattern in self.tool_patterns:
+            match = next((name for name in tool_names if name.startswith(pattern) and name not in picked), None)
+            if match:
+                picked.append(match)
+            if len(picked) >= self.tool_calls_per_turn:
+                break
+        return picked
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        tool_names = [t["function"]["name"] for t in tools or []]
+        last = messages[-1]
+        query = last.content if isinstance(last.content, str) else str(last.content)
+
+        if len(tool_names) == 1 and tool_names[0] == "LLMOutputBlock":
+            args = {"blocks": [{"block_type": "text", "text": query}]}
+            return AIMessage(content="", tool_calls=[{"name": "LLMOutputBlock", "args": args, "id": "structured"}])
+        if tool_names and isinstance(last, HumanMessage):
+            calls = [{"name": name, "args": {"query": query}, "id": f"call_{i}"} for i, name in enumerate(self._pick_tools(tool_names))]
+            if calls:
+                return AIMessage(content="", tool_calls=calls)
+        if tool_names or isinstance(last, ToolMessage):
+            return AIMessage(content=self._text(self.response_tokens))
+        return AIMessage(content=self._text(max(1, self.response_tokens // 4)))
+
+    def _usage(self, messages: List[BaseMessage], message: AIMessage) -> Dict[str, int]:
+        input_tokens = sum(len(str(m.content).split()) + 4 for m in messages)
+        output_tokens = max(1, len(str(message.content).split())) + 10 * len(message.tool_calls)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _latency(self, message: AIMessage) -> float:
+        tokens = len(str(message.content).split()) + 10 * len(message.tool_calls)
+        return (self.first_token_ms + self.per_token_ms * tokens) / 1000
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"))
+        time.sleep(self._latency(message))
+        message.usage_metadata = self._usage(messages, message) # type: ignore[assignment]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self._latency(message))
+        message.usage_metadata = self._usage(messages, message) # type: ignore[assignment]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self.first_token_ms / 1000)
+        if message.tool_calls:
+            await asyncio.sleep(self._latency(message) - self.first_token_ms / 1000)
+            chunks = [{"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i} for i, c in enumerate(message.tool_calls)]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=chunks))
+            return
+        for word in str(message.content).split():
+            await asyncio.sleep(self.per_token_ms / 1000)
+            token = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(token.text, chunk=token)
+            yield token
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic, model-free embeddings: hashed bag of words, L2-normalized."""
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,210 @@
+"""Offline load test for the chat API.
+
+Starts the real FastAPI app (lifespan included) in-process against a scripted fake LLM, a local
+stub MCP server over streamable HTTP and an embedded Chroma store with hash embeddings, so no
+OpenRouter, GitHub or model downloads are involved. Virtual users create a session and then send
+chat messages at the requested concurrency; the report has throughput, per-endpoint latency
+percentiles and per-stage percentiles taken from the turn traces.
+
+    python -m benchmarks.loadtest --sessions 50 --concurrency 10 --messages 3 --json report.json
+"""
+from typing import Any, Dict, List
+from collections import defaultdict
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def _configure_environment(workdir: str) -> None:
+    # Must run before any app module imports core.config, which reads the environment once
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}",
+        "SQLALCHEMY_ECHO": "false",
+        "TRACE_EXPORTER": "json",
+        "TRACE_FILE": os.path.join(workdir, "traces.jsonl"),
+        "MCP_TOOL_CACHE_PATH": os.path.join(workdir, "mcp_tools.json"),
+        "GITHUB_COPILOT_TOKEN": "Bearer stub",
+    })
+
+
+def _quiet_logs() -> None:
+    # Per-request INFO lines from httpx and the MCP server would drown out the report
+    for name in ("httpx", "mcp", "uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def _install_fakes(args: argparse.Namespace, stub_url: str) -> None:
+    """Points the app at the fake LLM, stub MCP server and embedded vector store."""
+    from functools import lru_cache
+    import chromadb # type: ignore
+    from langchain_chroma import Chroma # type: ignore
+    from langchain_core.documents import Document # type: ignore
+    from core import config
+    import main
+    from services import embeddings, rag
+    from benchmarks.fakes import HashEmbeddings, ScriptedChatModel
+
+    config.MCP_SERVERS = {
+        "github": {"transport": "streamable_http", "url": stub_url, "headers": {"Authorization": "Bearer stub"}},
+    }
+    llm = ScriptedChatModel(
+        first_token_ms=args.llm_latency_ms,
+        per_token_ms=args.token_latency_ms,
+        response_tokens=args.response_tokens,
+        tool_calls_per_turn=args.tool_calls,
+    )
+    main.initialize_llm = lambda *_args: llm
+
+    hash_embeddings = HashEmbeddings()
+    embeddings._load_embedding_function = lambda _backend: hash_embeddings
+    client = chromadb.EphemeralClient()
+
+    @lru_cache(maxsize=None)
+    def get_store(collection_name: str = "default") -> Chroma:
+        store = Chroma(client=client, collection_name=collection_name, embedding_function=hash_embeddings)
+        docs = [
+            Document(page_content=f"{collection_name} reference section {i}: rules, configuration and examples.", metadata={"id": f"{collection_name}:{i}"})
+            for i in range(args.docs_per_source)
+        ]
+        store.add_documents(docs, ids=[d.metadata["id"] for d in docs])
+        return store
+
+    rag._get_chroma_client = get_store
+    rag._is_chroma_available = lambda: True
+    main._is_chroma_available = lambda: True
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def _stage_latencies(trace_file: str) -> Dict[str, List[float]]:
+    stages: Dict[str, List[float]] = defaultdict(list)
+    if not os.path.exists(trace_file):
+        return stages
+    with open(trace_file) as f:
+        for line in f:
+            for span in json.loads(line)["spans"]:
+                stages[span["name"]].append(span["duration_ms"])
+    return stages
+
+
+async def _run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    import httpx # type: ignore
+    import main
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(args.sessions):
+        queue.put_nowait(i)
+
+    async def timed_post(client: Any, name: str, path: str, body: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        response = await client.post(path, json=body)
+        latencies[name].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            errors[name] += 1
+            return None
+        return response.json()
+
+    async def virtual_user(client: Any, user_id: int) -> None:
+        while not queue.empty():
+            n = queue.get_nowait()
+            session = await timed_post(client, "POST /sessions/", "/api/v1/sessions/",
+                                       {"user_id": user_id, "initial_message": f"Session {n}: how do I get out of jail?"})
+            if session is None:
+                continue
+            for m in range(args.messages):
+                await timed_post(client, "POST /sessions/chat", "/api/v1/sessions/chat",
+                                 {"session_id": session["id"], "user_id": user_id, "content": f"Follow-up {m} in session {n}: what about doubles?"})
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            user = (await client.post("/api/v1/users/", json={"username": f"loadtest-{os.getpid()}"})).json()
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_user(client, user["id"]) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    requests_sent = sum(len(v) for v in latencies.values())
+    stages = _stage_latencies(os.path.join(workdir, "traces.jsonl"))
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "requests": requests_sent,
+        "errors": dict(errors),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests_sent / elapsed, 2) if elapsed else 0.0,
+        "endpoints_ms": {name: _percentiles(values) for name, values in latencies.items()},
+        "stages_ms": {name: _percentiles(values) for name, values in sorted(stages.items())},
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['requests']} requests in {report['duration_s']}s "
+          f"({report['throughput_rps']} req/s), errors: {report['errors'] or 'none'}")
+    for title, rows in (("Endpoint", report["endpoints_ms"]), ("Stage", report["stages_ms"])):
+        print(f"\n{title:<28}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for name, p in rows.items():
+            print(f"{name:<28}{p['count']:>7}{p['mean']:>10}{p['p50']:>10}{p['p95']:>10}{p['p99']:>10}{p['max']:>10}")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test with a fake LLM, stub MCP server and embedded vector store.")
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions to create (one POST /sessions/ each).")
+    parser.add_argument("--messages", type=int, default=2, help="POST /sessions/chat calls per session.")
+    parser.add_argument("--concurrency", type=int, default=5, help="Virtual users running at once.")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Fake LLM time to first token.")
+    parser.add_argument("--token-latency-ms", type=float, default=5.0, help="Fake LLM time per generated token.")
+    parser.add_argument("--response-tokens", type=int, default=80, help="Tokens in each fake final answer.")
+    parser.add_argument("--tool-calls", type=int, default=2, help="Tool calls the fake LLM makes per turn.")
+    parser.add_argument("--mcp-latency-ms", type=float, default=50.0, help="Latency of each stub MCP tool call.")
+    parser.add_argument("--docs-per-source", type=int, default=200, help="Documents seeded into each embedded collection.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds.")
+    parser.add_argument("--json", help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        _configure_environment(workdir)
+        from benchmarks.stub_mcp_server import StubMCPServer
+        stub = StubMCPServer(latency_ms=args.mcp_latency_ms).start()
+        _quiet_logs()
+        try:
+            _install_fakes(args, stub.url)
+            report = asyncio.run(_run(args, workdir))
+        finally:
+            stub.stop()
+
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
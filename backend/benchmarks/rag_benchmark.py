@@ -0,0 +1,196 @@
+"""Retrieval benchmark for the RAG pipeline.
+
+Indexes a question set's source document once per configuration (chunk size, chunk overlap,
+embedding backend) into an in-memory Chroma collection using the same splitter and add_to_chroma
+path as data/populate_vectors.py, then runs every question and scores the top-k chunks.
+
+A chunk is relevant when it comes from the expected page and contains the question's evidence
+phrase after whitespace normalization, so the checked-in set does not depend on chunk IDs.
+Reported per configuration: recall@k (share of questions with a relevant chunk in the top k),
+MRR, query latency percentiles, ingestion throughput and evidence coverage (share of questions
+whose evidence survives splitting intact in some chunk).
+
+    python -m benchmarks.rag_benchmark --chunk-sizes 400,800,1200 --embeddings onnx --output rag.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import chromadb # type: ignore # noqa: E402
+from langchain_chroma import Chroma # type: ignore # noqa: E402
+from langchain_core.documents import Document # type: ignore # noqa: E402
+from langchain_core.embeddings import Embeddings # type: ignore # noqa: E402
+from data import populate_vectors # noqa: E402
+from services.embeddings import get_embedding_function # noqa: E402
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "monopoly_questions.json")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"mean": round(sum(ordered) / len(ordered), 3), "p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 3)}
+
+
+def _load_embeddings(name: str) -> Embeddings:
+    if name == "hash":
+        # Model-free baseline; useful offline and as a floor for the real models
+        from benchmarks.fakes import HashEmbeddings
+        return HashEmbeddings()
+    return get_embedding_function(name)
+
+
+def _is_relevant(chunk: Document, question: Dict[str, Any]) -> bool:
+    return chunk.metadata.get("page") == question["page"] and _normalize(question["evidence"]) in _normalize(chunk.page_content)
+
+
+def run_config(pages: List[Document], questions: List[Dict[str, Any]], embeddings: Embeddings,
+               chunk_size: int, chunk_overlap: int, ks: List[int], batch_size: int) -> Dict[str, Any]:
+    """Indexes the pages with one configuration and scores every question against it."""
+    client = chromadb.EphemeralClient()
+    collection_name = f"bench-{uuid.uuid4().hex[:8]}"
+    db = Chroma(client=client, collection_name=collection_name, embedding_function=embeddings)
+
+    chunks = list(populate_vectors.iter_chunks([d.model_copy(deep=True) for d in pages], chunk_size, chunk_overlap))
+    started = time.perf_counter()
+    _, added = populate_vectors.add_to_chroma(iter(chunks), collection_name, batch_size, db=db)
+    ingest_seconds = time.perf_counter() - started
+    coverage = sum(any(_is_relevant(c, q) for c in chunks) for q in questions) / len(questions)
+
+    max_k = max(ks)
+    hits_at = {k: 0 for k in ks}
+    reciprocal_ranks: List[float] = []
+    embed_ms: List[float] = []
+    search_ms: List[float] = []
+    total_ms: List[float] = []
+    per_question: List[Dict[str, Any]] = []
+    for question in questions:
+        # Same retrieval path as services.rag.aquery_vector_database, minus the micro-batcher
+        t0 = time.perf_counter()
+        vector = embeddings.embed_query(question["question"])
+        t1 = time.perf_counter()
+        results = db.similarity_search_by_vector_with_relevance_scores(vector, max_k)
+        t2 = time.perf_counter()
+        embed_ms.append((t1 - t0) * 1000)
+        search_ms.append((t2 - t1) * 1000)
+        total_ms.append((t2 - t0) * 1000)
+
+        rank: Optional[int] = next((i + 1 for i, (doc, _score) in enumerate(results) if _is_relevant(doc, question)), None)
+        for k in ks:
+            hits_at[k] += int(rank is not None and rank <= k)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        per_question.append({"id": question["id"], "rank": rank, "retrieved": [doc.metadata.get("id") for doc, _ in results]})
+
+    client.delete_collection(collection_name)
+    return {
+        "ingest": {
+            "pages": len(pages),
+            "chunks": added,
+            "seconds": round(ingest_seconds, 3),
+            "chunks_per_second": round(added / ingest_seconds, 2) if ingest_seconds else None,
+            "pages_per_second": round(len(pages) / ingest_seconds, 2) if ingest_seconds else None,
+            "evidence_coverage": round(coverage, 4),
+        },
+        "retrieval": {
+            **{f"recall@{k}": round(hits_at[k] / len(questions), 4) for k in ks},
+            f"mrr@{max_k}": round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+            "latency_ms": {"total": _percentiles(total_ms), "embed": _percentiles(embed_ms), "search": _percentiles(search_ms)},
+        },
+        "per_question": per_question,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark RAG retrieval quality, latency and ingestion throughput.")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Question set JSON (source path is relative to the backend dir).")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[populate_vectors.CHUNK_SIZE])
+    parser.add_argument("--chunk-overlaps", type=_int_list, default=[populate_vectors.CHUNK_OVERLAP])
+    parser.add_argument("--embeddings", default="onnx", help="Comma-separated backends: torch, onnx, hash.")
+    parser.add_argument("--k", type=_int_list, default=[1, 3, 4, 5, 10], help="Cut-offs for recall@k; 4 is what the agent uses.")
+    parser.add_argument("--batch-size", type=int, default=populate_vectors.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--per-question", action="store_true", help="Include per-question ranks in the report.")
+    args = parser.parse_args(argv)
+
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+    source_path = os.path.join(BACKEND_DIR, dataset["source"])
+    started = time.perf_counter()
+    pages = list(populate_vectors._iter_pdf_pages(source_path))
+    load_seconds = time.perf_counter() - started
+    for page in pages:
+        # Relative source keeps chunk IDs comparable between machines
+        page.metadata["source"] = dataset["source"]
+
+    results: List[Dict[str, Any]] = []
+    for embedding_name in args.embeddings.split(","):
+        embeddings = _load_embeddings(embedding_name)
+        for chunk_size, chunk_overlap in itertools.product(args.chunk_sizes, args.chunk_overlaps):
+            if chunk_overlap >= chunk_size:
+                continue
+            result = run_config(pages, dataset["questions"], embeddings, chunk_size, chunk_overlap, args.k, args.batch_size)
+            if not args.per_question:
+                result.pop("per_question")
+            result = {"config": {"embedding": embedding_name, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}, **result}
+            results.append(result)
+            retrieval = result["retrieval"]
+            print(
+                f"📊 {embedding_name} size={chunk_size} overlap={chunk_overlap}: "
+                + " ".join(f"{k}={v}" for k, v in retrieval.items() if k != "latency_ms")
+                + f" p95={retrieval['latency_ms']['total']['p95']}ms ingest={result['ingest']['chunks_per_second']} chunks/s",
+                file=sys.stderr,
+            )
+
+    report = {
+        "run": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "dataset": dataset["name"],
+            "questions": len(dataset["questions"]),
+            "pdf_load_seconds": round(load_seconds, 3),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
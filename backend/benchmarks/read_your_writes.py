@@ -0,0 +1,106 @@
+"""Checks read-your-writes routing against a lagging read replica, using two local SQLite files.
+
+DATABASE_URL points at primary.db and READ_DATABASE_URL at replica.db in a temporary directory.
+The replica is a snapshot of the primary taken with SQLite's backup API and is only refreshed when
+this script "replicates", so it lags by as long as we like. Each step clears the in-process
+recent-writes record first, which is what a read served by another worker sees.
+
+    python -m benchmarks.read_your_writes
+
+To try the same by hand, start the API with both variables set (copy the primary to the replica
+with `sqlite3 primary.db ".backup replica.db"` to replicate), POST /api/v1/sessions/ and then GET
+the session with and without the returned last_write_at cookie / X-Last-Write-At header.
+"""
+from typing import Any, List, Tuple
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def _replicate(primary: str, replica: str) -> None:
+    source, target = sqlite3.connect(primary), sqlite3.connect(replica)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+async def _run(primary: str, replica: str) -> List[Tuple[str, int, int]]:
+    import httpx # type: ignore
+    import main
+    from api.v1.endpoints import sessions
+    from benchmarks.fakes import ScriptedChatModel
+    from db import session as db_session
+    from db.base import Base
+    from db.migrations import add_missing_columns
+    from services.agent import create_mcp_agent_executor
+
+    async with db_session.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    llm = ScriptedChatModel(first_token_ms=0, per_token_ms=0, response_tokens=5)
+    executor = create_mcp_agent_executor(llm, [])
+    main.app.dependency_overrides[sessions.get_agent_executor_dependency] = lambda: executor
+    main.app.dependency_overrides[sessions.get_llm_instance_dependency] = lambda: llm
+
+    async def replicate() -> None:
+        await db_session.read_engine.dispose()
+        _replicate(primary, replica)
+
+    def other_worker() -> None:
+        db_session.recent_writes._written.clear()
+
+    results: List[Tuple[str, int, int]] = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://rw") as writer, \
+            httpx.AsyncClient(transport=transport, base_url="http://rw") as stranger:
+        user = (await writer.post("/api/v1/users/", json={"username": "read-your-writes"})).json()
+        await replicate()
+        created = await writer.post("/api/v1/sessions/", json={"user_id": user["id"], "initial_message": "Hello"})
+        path = f"/api/v1/sessions/{created.json()['id']}"
+
+        async def check(name: str, client: Any, expected: int) -> None:
+            results.append((name, expected, (await client.get(path)).status_code))
+
+        await check("writer, same worker", writer, 200)
+        other_worker()
+        await check("writer, other worker (cookie)", writer, 200)
+        await check("other client, lagging replica", stranger, 404)
+        await replicate()
+        await check("other client, after replication", stranger, 200)
+    main.app.dependency_overrides.clear()
+    await db_session.read_engine.dispose()
+    await db_session.engine.dispose()
+    return results
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check read-your-writes routing with a primary and a lagging SQLite replica.")
+    parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="read-your-writes-") as workdir:
+        primary, replica = os.path.join(workdir, "primary.db"), os.path.join(workdir, "replica.db")
+        # Must be set before core.config is imported
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{primary}"
+        os.environ["READ_DATABASE_URL"] = f"sqlite+aiosqlite:///{replica}"
+        os.environ["SQLALCHEMY_ECHO"] = "false"
+        results = asyncio.run(_run(primary, replica))
+
+    failed = 0
+    for name, expected, status in results:
+        ok = expected == status
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {name:<34} expected {expected}, got {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
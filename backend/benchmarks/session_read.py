@@ -0,0 +1,179 @@
+"""Benchmark for GET /api/v1/sessions/{session_id} on a long session.
+
+Seeds a temporary SQLite database with one session of --messages messages (every --react-every-th
+AI message carries a chart component) and times the endpoint against the previous implementation
+(ORM rows -> ChatMessageResponse.from_orm -> FastAPI's default encoder), mounted on the same app.
+Also reports the response size per Accept-Encoding.
+
+    python -m benchmarks.session_read --messages 1000 --repeat 50 --json session_read.json
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+CHART_CODE = """export default function Chart() {
+  const data = %s;
+  return (
+    <div style={{ display: 'flex', gap: 4, alignItems: 'flex-end', height: 200 }}>
+      {data.map((d, i) => <div key={i} title={d.label} style={{ width: 24, height: d.value * 2, background: '#4f46e5' }} />)}
+    </div>
+  );
+}"""
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"mean": round(sum(ordered) / len(ordered), 2), "p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 2)}
+
+
+def _ai_content(n: int, with_chart: bool) -> Dict[str, Any]:
+    text = f"Answer {n}: " + " ".join(f"the rent on property {i} doubles with a full colour set" for i in range(8))
+    blocks: List[Dict[str, Any]] = [{"block_type": "text", "text": text}]
+    if with_chart:
+        series = [{"label": f"Property {i}", "value": (n * 7 + i * 13) % 97} for i in range(20)]
+        blocks.append({"block_type": "react", "description": "Rent by property", "code": CHART_CODE % json.dumps(series)})
+    return {"blocks": blocks}
+
+
+async def _seed(args: argparse.Namespace) -> str:
+    from db.base import Base
+    from db.migrations import add_missing_columns
+    from db.session import AsyncSessionLocal, engine
+    from models.user import User
+    from crud import chat as chat_crud
+    from schemas.chat import LLMOutputBlock
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    async with AsyncSessionLocal() as db:
+        user = User(username="bench")
+        db.add(user)
+        await db.commit()
+        session, _ = await chat_crud.create_chat_session(db, user.id, "How does rent work?")
+        for n in range(1, args.messages):
+            if n % 2 == 0:
+                await chat_crud.add_user_message_to_session(db, session.id, f"Question {n}: what is the rent for property {n % 28}?")
+                continue
+            content = _ai_content(n, args.react_every and (n // 2) % args.react_every == 0)
+            if args.inline_code:
+                # Rows written before code_blobs existed keep the component code inline
+                message = chat_crud._new_message(session.id, "ai", content)
+                await chat_crud._record_message(db, message)
+                await db.commit()
+            else:
+                await chat_crud.add_ai_message_to_session(db, session.id, LLMOutputBlock.model_validate(content))
+    return session.id
+
+
+def _mount_legacy_route(app: Any) -> None:
+    """The endpoint as it was before the orjson/dict fast path, for comparison."""
+    from fastapi import Depends # type: ignore
+    from sqlalchemy.ext.asyncio import AsyncSession # type: ignore
+    from crud import chat as chat_crud
+    from db.session import get_read_db_session
+    from schemas.chat import ChatMessageResponse, ChatSessionResponse
+
+    async def legacy_get_session(session_id: str, react_code: str = "inline", db: AsyncSession = Depends(get_read_db_session)):
+        session = await chat_crud.get_chat_session(db, session_id)
+        messages = [ChatMessageResponse.from_orm(m) for m in await chat_crud.get_chat_messages(db, session_id)]
+        if react_code == "inline":
+            # Same response shape as the current endpoint, which returns ReactBlock code unless asked for hashes
+            contents = await chat_crud.inline_react_code(db, [m.content for m in messages])
+            messages = [m.model_copy(update={"content": c}) for m, c in zip(messages, contents)]
+        return ChatSessionResponse(
+            id=session.id,
+            user_id=session.user_id,
+            title=session.title,
+            created_at=session.created_at,
+            updated_at=session.updated_at,
+            message_count=session.message_count,
+            last_message_preview=session.last_message_preview,
+            last_message_at=session.last_message_at,
+            messages=messages
+        )
+
+    app.add_api_route("/bench/legacy/{session_id}", legacy_get_session, methods=["GET"], response_model=ChatSessionResponse)
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx # type: ignore
+    import main
+
+    session_id = await _seed(args)
+    _mount_legacy_route(main.app)
+    query = f"?react_code={args.react_code}"
+    paths = {"legacy": f"/bench/legacy/{session_id}{query}", "current": f"/api/v1/sessions/{session_id}{query}"}
+    encodings = ["identity", "gzip"] + (["br"] if _has_brotli() else [])
+
+    report: Dict[str, Any] = {"latency_ms": {}, "bytes": {}}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        first = {name: (await client.get(path, headers={"Accept-Encoding": "identity"})).json() for name, path in paths.items()}
+        report["same_body"] = first["legacy"] == first["current"]
+        for name, path in paths.items():
+            for encoding in encodings:
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    response = await client.get(path, headers={"Accept-Encoding": encoding})
+                    timings.append((time.perf_counter() - started) * 1000)
+                report["latency_ms"][f"{name}/{encoding}"] = _percentiles(timings)
+                report["bytes"][f"{name}/{encoding}"] = int(response.headers["content-length"])
+    return report
+
+
+def _has_brotli() -> bool:
+    from api import middleware
+    return middleware.brotli is not None
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark reading one long chat session over the API.")
+    parser.add_argument("--messages", type=int, default=1000, help="Messages in the seeded session.")
+    parser.add_argument("--react-every", type=int, default=3, help="Every n-th AI message carries a chart component; 0 for none.")
+    parser.add_argument("--inline-code", action="store_true", help="Store component code inline, as rows written before code_blobs.")
+    parser.add_argument("--react-code", choices=["inline", "hash"], default="inline", help="Request component code inline (the default) or as code_hash only.")
+    parser.add_argument("--repeat", type=int, default=30, help="Requests per path and encoding.")
+    parser.add_argument("--json", help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="session-read-") as workdir:
+        # Must be set before core.config is imported
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ["SQLALCHEMY_ECHO"] = "false"
+        os.environ["ARCHIVE_AFTER_DAYS"] = "0"
+        report = asyncio.run(_run(args))
+    report = {
+        "run": {"timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")},
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        **report,
+    }
+
+    print(f"📊 {args.messages} messages, identical bodies: {report['same_body']}")
+    print(f"\n{'path/encoding':<22}{'bytes':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for key, p in report["latency_ms"].items():
+        print(f"{key:<22}{report['bytes'][key]:>10}{p['mean']:>10}{p['p50']:>10}{p['p95']:>10}{p['max']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,81 @@
+from typing import Optional
+import asyncio
+import socket
+import threading
+import time
+import uvicorn # type: ignore
+from mcp.server.fastmcp import FastMCP # type: ignore
+
+
+def build_stub_server(latency_ms: float = 50.0) -> FastMCP:
+    """A GitHub-like MCP server whose tools sleep for `latency_ms` and return canned text."""
+    server = FastMCP("github-stub", stateless_http=True)
+    delay = latency_ms / 1000
+
+    @server.tool()
+    async def get_me() -> str:
+        """Get details of the authenticated GitHub user."""
+        await asyncio.sleep(delay)
+        return '{"login": "octocat", "id": 1}'
+
+    @server.tool()
+    async def search_repositories(query: str) -> str:
+        """Search GitHub repositories by name, topic or description."""
+        await asyncio.sleep(delay)
+        return f'{{"total_count": 2, "items": [{{"full_name": "octocat/{query[:20]}"}}, {{"full_name": "octocat/hello-world"}}]}}'
+
+    @server.tool()
+    async def search_issues(query: str) -> str:
+        """Search issues and pull requests across GitHub repositories."""
+        await asyncio.sleep(delay)
+        return f'{{"total_count": 1, "items": [{{"number": 42, "title": "{query[:40]}"}}]}}'
+
+    @server.tool()
+    async def get_file_contents(owner: str, repo: str, path: str) -> str:
+        """Get the contents of a file or directory from a GitHub repository."""
+        await asyncio.sleep(delay)
+        return f"# {owner}/{repo}/{path}\n\nHello, world."
+
+    return server
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubMCPServer:
+    """Runs the stub server over streamable HTTP on a local port in a background thread."""
+
+    def __init__(self, latency_ms: float = 50.0, port: Optional[int] = None):
+        self.port = port or _free_port()
+        app = build_stub_server(latency_ms).streamable_http_app()
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/mcp"
+
+    def start(self, timeout: float = 10.0) -> "StubMCPServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Stub MCP server did not start.")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    stub = StubMCPServer(port=8765).start()
+    print(f"✅ Stub MCP server listening on {stub.url}")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
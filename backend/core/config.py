@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,6 +8,8 @@ load_dotenv()
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL")
 LLM_MODEL_NAME = "x-ai/grok-4-fast:free"
+# "auto" adds cache_control breakpoints for providers that need them (Anthropic, Gemini); "on"/"off" force it
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "auto").lower()
 
 # --- MCP Server Configuration ---
 MCP_SERVERS = {
@@ -19,13 +22,145 @@ MCP_SERVERS = {
     }
 }
 
+# Session pool tuning for the MCP servers above
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "20"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+MCP_KEEPALIVE_SECONDS = float(os.getenv("MCP_KEEPALIVE_SECONDS", "30"))
+MCP_RECONNECT_INITIAL_SECONDS = float(os.getenv("MCP_RECONNECT_INITIAL_SECONDS", "1"))
+MCP_RECONNECT_MAX_SECONDS = float(os.getenv("MCP_RECONNECT_MAX_SECONDS", "60"))
+# Discovered tool definitions are cached here so startup doesn't wait on the remote servers
+MCP_TOOL_CACHE_PATH = os.getenv("MCP_TOOL_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "mcp_tools.json"))
+
+# --- Agent Tool Execution ---
+# Tool calls emitted in one agent step run concurrently, up to this many at a time
+MAX_PARALLEL_TOOL_CALLS = int(os.getenv("MAX_PARALLEL_TOOL_CALLS", "4"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "60"))
+# Per-tool overrides keyed by fnmatch pattern, e.g. {"RAG_*": 30}
+TOOL_TIMEOUTS = json.loads(os.getenv("TOOL_TIMEOUTS", "{}"))
+
+# --- Agent Budgets ---
+# Server-side ceilings for one agent turn; requests may ask for less but never more
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "8"))
+AGENT_MAX_SECONDS = float(os.getenv("AGENT_MAX_SECONDS", "90"))
+AGENT_MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "60000"))
+# Share of the turn's token budget the tool results in an early-stop answer may take, split across them
+AGENT_PARTIAL_ANSWER_SHARE = float(os.getenv("AGENT_PARTIAL_ANSWER_SHARE", "0.1"))
+
+# --- Tracing ---
+# Per-turn spans are exported as "json" (one trace per line in TRACE_FILE), "otel" (needs opentelemetry) or "none";
+# stage latency histograms are always served at /metrics
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "traces", "traces.jsonl"))
+
+# --- Chat History ---
+# Token budget for the history sent to the agent; the newest messages that fit are kept (0 keeps all)
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "8000"))
+
+# --- Tool Routing ---
+# Only the TOOL_ROUTER_TOP_N tools most similar to the query are bound per turn (0 binds every tool).
+# The query is the new message plus the previous user message; tools a conversation needs whatever
+# was asked belong in TOOL_ROUTER_ALWAYS_INCLUDE (comma-separated fnmatch patterns). The RAG tools and
+# get_me are always bound by default; the bound set is sorted by name so the cached prompt prefix stays stable.
+TOOL_ROUTER_TOP_N = int(os.getenv("TOOL_ROUTER_TOP_N", "8"))
+TOOL_ROUTER_ALWAYS_INCLUDE = [p for p in os.getenv("TOOL_ROUTER_ALWAYS_INCLUDE", "RAG_*,get_me").split(",") if p]
+
+# --- Tool Result Cache ---
+# Only read-only tools listed here (fnmatch pattern -> TTL seconds) are memoized; mutating MCP tools stay uncached.
+# The defaults apply only when TOOL_CACHE_TTLS is unset, so TOOL_CACHE_TTLS='{}' turns the cache off
+DEFAULT_TOOL_CACHE_TTLS = {
+    "RAG_*": 600,
+    "get_me": 300,
+    "get_file_contents": 120,
+    "get_commit": 600,
+    "get_issue": 60,
+    "get_issue_comments": 60,
+    "get_pull_request": 60,
+    "get_pull_request_files": 60,
+    "get_pull_request_diff": 60,
+    "get_latest_release": 300,
+    "get_tag": 600,
+    "list_branches": 120,
+    "list_commits": 60,
+    "list_issues": 60,
+    "list_pull_requests": 60,
+    "list_releases": 300,
+    "list_tags": 300,
+    "search_code": 120,
+    "search_issues": 60,
+    "search_pull_requests": 60,
+    "search_repositories": 300,
+    "search_users": 300,
+}
+TOOL_CACHE_TTLS = json.loads(os.environ["TOOL_CACHE_TTLS"]) if "TOOL_CACHE_TTLS" in os.environ else DEFAULT_TOOL_CACHE_TTLS
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+
 # --- Database Configuration ---
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+# Defaults to a file under data/db so sessions survive restarts (an in-memory database is per connection).
+# Under the prefork server every worker has its own writer, so concurrent writes wait on busy_timeout
+# and can still fail with SQLITE_BUSY when they queue past it; use Postgres for write-heavy deployments.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///" + os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "db", "chat.db"))
+# Optional replica for the read-only endpoints; unset means they use DATABASE_URL
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+# Reads of a session or user written this recently go to the primary instead of a lagging replica
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# File-backed SQLite: one writer connection (WAL), a pool of query_only readers, and these pragmas on connect
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+# Number of server processes sharing the database (set by gunicorn.conf.py; 1 under plain uvicorn)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# A writer may queue behind every other worker's writer, so the default wait grows with the worker count
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", str(5000 * WEB_CONCURRENCY)))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))  # Page cache per connection
 
 # --- ChromaDB Configuration ---
 CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT = os.getenv("CHROMA_PORT", "8001")
 
+# --- Embedding Configuration ---
+# "torch" runs sentence-transformers through PyTorch, "onnx" runs the exported model through ONNX Runtime.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 lets the runtime decide
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "false").lower() == "true"
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))  # Upper bound on queries per micro-batch
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "models"))
+
+# --- Background Ingestion ---
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+# Fraction of wall time the background indexer may spend embedding; it sleeps for the rest
+INGEST_CPU_SHARE = float(os.getenv("INGEST_CPU_SHARE", "0.5"))
+# Bearer token for the POST /admin/ingest endpoints; unset leaves them disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# --- Idempotency ---
+# How long POST /sessions/chat responses are replayed for a repeated Idempotency-Key
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# A key still pending after this long belongs to a request that died; a retry may take it over
+IDEMPOTENCY_PENDING_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "300"))
+
+# --- Chat Archive ---
+# Messages of sessions idle this long move into one compressed block per session; 0 disables tiering
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "100"))  # Sessions archived per run
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "zstd").lower()  # "zstd" or "zlib"
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "9"))
+
+# --- Startup ---
+# Per-step timeouts for the concurrent startup graph in main.lifespan
+STARTUP_DB_TIMEOUT = float(os.getenv("STARTUP_DB_TIMEOUT", "30"))
+STARTUP_MCP_TIMEOUT = float(os.getenv("STARTUP_MCP_TIMEOUT", "20"))
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "180"))
+# Singleton jobs (archiver, chat backfill, indexer, MCP schema cache writes) only run in the process holding this lock
+LEADER_LOCK_PATH = os.getenv("LEADER_LOCK_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "db", "leader.lock"))
+
+# --- HTTP ---
+# Responses at least this large are compressed (brotli when installed and accepted, else gzip)
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
 # --- Environment/Logging ---
 ENV = os.getenv("ENV", "development")
 SQLALCHEMY_ECHO = os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true"
@@ -1,54 +1,410 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from models.chat import ChatSession, ChatMessage
+from sqlalchemy import String, case, cast, delete, func, null, update # type: ignore
+from sqlalchemy.dialects import postgresql, sqlite # type: ignore
+from sqlalchemy.exc import IntegrityError # type: ignore
+from models.chat import ChatSession, ChatMessage, ChatMessageArchive, CodeBlob, IdempotencyKey
 from uuid import uuid4
-from typing import List
+from typing import Any, Dict, List, Optional
+import datetime
+import hashlib
+import json
+from core import config
 from schemas.chat import LLMOutputBlock
+from services.compression import compress, decompress
+from services.message_converter import TIKTOKEN_ESTIMATOR, content_to_plain_text, count_tokens, token_estimator
+
+PREVIEW_LENGTH = 120
+
+def _preview(plain_text: str) -> str:
+    return " ".join(plain_text.split())[:PREVIEW_LENGTH]
+
+def _new_message(session_id: str, role: str, content: Dict[str, Any], tool_used: Optional[str] = None) -> ChatMessage:
+    """Builds a ChatMessage with its plain text and token count derived once, at write time."""
+    plain_text = content_to_plain_text(content)
+    return ChatMessage(
+        chat_session_id=session_id,
+        role=role,
+        content=content,
+        tool_used=tool_used,
+        plain_text=plain_text,
+        token_count=count_tokens(plain_text),
+        token_estimator=token_estimator(),
+    )
+
+async def _record_message(db: AsyncSession, message: ChatMessage) -> None:
+    """Adds a message and bumps its session's counters; the caller's commit covers both."""
+    db.add(message)
+    await db.execute(
+        update(ChatSession)
+        .where(ChatSession.id == message.chat_session_id)
+        .values(
+            message_count=ChatSession.message_count + 1,
+            last_message_preview=_preview(message.plain_text),
+            last_message_at=func.now(),
+        )
+    )
 
 async def create_chat_session(db: AsyncSession, user_id: int, initial_message: str):
     session_id = str(uuid4())
     initial_title = initial_message[:30] + "..."
     
-    new_session = ChatSession(id=session_id, user_id=user_id, title=initial_title)
-    db.add(new_session)
-    await db.commit()
-    await db.refresh(new_session)
-    
-    user_message = ChatMessage(
-        chat_session_id=session_id,
-        role="user",
-        content={"text": initial_message}
+    user_message = _new_message(session_id, "user", {"text": initial_message})
+    new_session = ChatSession(
+        id=session_id,
+        user_id=user_id,
+        title=initial_title,
+        message_count=1,
+        last_message_preview=_preview(user_message.plain_text),
+        last_message_at=func.now(),
     )
+    db.add(new_session)
+    await db.flush()
     db.add(user_message)
-    await db.commit()
+    # Refresh before committing: a refresh after it would open a new transaction and keep the
+    # connection checked out through the agent run that follows
+    await db.flush()
+    await db.refresh(new_session)
     await db.refresh(user_message)
+    await db.commit()
     
     return new_session, user_message
 
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+async def _store_code_blobs(db: AsyncSession, blobs: Dict[str, str]) -> None:
+    """Inserts the blobs whose hash is not stored yet; concurrent writers of the same code are ignored."""
+    if not blobs:
+        return
+    rows = [{"hash": h, "code": code, "size": len(code.encode())} for h, code in blobs.items()]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        await db.execute(insert(CodeBlob).values(rows).on_conflict_do_nothing(index_elements=["hash"]))
+        return
+    existing = await db.execute(select(CodeBlob.hash).filter(CodeBlob.hash.in_(list(blobs))))
+    stored = set(existing.scalars().all())
+    db.add_all(CodeBlob(**row) for row in rows if row["hash"] not in stored)
+
+async def dedupe_react_code(db: AsyncSession, content: Dict[str, Any]) -> Dict[str, Any]:
+    """Moves ReactBlock code into code_blobs and returns the content with a code_hash in its place."""
+    blobs: Dict[str, str] = {}
+    blocks = []
+    for block in content.get("blocks", []):
+        if block.get("block_type") == "react" and isinstance(block.get("code"), str):
+            code = block["code"]
+            block = {k: v for k, v in block.items() if k != "code"}
+            block["code_hash"] = code_hash(code)
+            blobs[block["code_hash"]] = code
+        blocks.append(block)
+    if not blobs:
+        return content
+    await _store_code_blobs(db, blobs)
+    return {**content, "blocks": blocks}
+
+async def inline_react_code(db: AsyncSession, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Returns the contents with each ReactBlock's code_hash replaced by its code, as originally written.
+
+    All hashes are looked up in one query; a hash whose blob is missing keeps the hash-only shape.
+    """
+    def hashes_of(content: Dict[str, Any]):
+        for block in (content or {}).get("blocks", []):
+            if block.get("block_type") == "react" and "code" not in block and block.get("code_hash"):
+                yield block["code_hash"]
+
+    wanted = {h for content in contents for h in hashes_of(content)}
+    if not wanted:
+        return contents
+    result = await db.execute(select(CodeBlob.hash, CodeBlob.code).filter(CodeBlob.hash.in_(list(wanted))))
+    codes = dict(result.all())
+
+    def inline(content: Dict[str, Any]) -> Dict[str, Any]:
+        if not any(h in codes for h in hashes_of(content)):
+            return content
+        blocks = []
+        for block in content["blocks"]:
+            if block.get("block_type") == "react" and "code" not in block and block.get("code_hash") in codes:
+                block = {**{k: v for k, v in block.items() if k != "code_hash"}, "code": codes[block["code_hash"]]}
+            blocks.append(block)
+        return {**content, "blocks": blocks}
+
+    return [inline(content) for content in contents]
+
 async def add_ai_message_to_session(db: AsyncSession, session_id: str, ai_response_content: LLMOutputBlock, tools_used: List[str] = None):
     """Adds an AI message to a session, optionally including tools used."""
-    ai_message = ChatMessage(
-        chat_session_id=session_id,
-        role="ai",
-        content=ai_response_content.model_dump(),
-        tool_used=", ".join(tools_used) if tools_used else None
+    ai_message = _new_message(
+        session_id,
+        "ai",
+        await dedupe_react_code(db, ai_response_content.model_dump()),
+        ", ".join(tools_used) if tools_used else None,
     )
-    db.add(ai_message)
-    await db.commit()
+    await _record_message(db, ai_message)
+    await db.flush()
     await db.refresh(ai_message)
+    await db.commit()
     return ai_message
 
 async def get_chat_session(db: AsyncSession, session_id: str):
     result = await db.execute(select(ChatSession).filter(ChatSession.id == session_id))
     return result.scalars().first()
 
+ARCHIVED_COLUMNS = ("id", "role", "is_summary", "tool_used", "content", "plain_text", "token_count", "token_estimator", "created_at")
+
+def _archive_row(message: ChatMessage) -> Dict[str, Any]:
+    row = {column: getattr(message, column) for column in ARCHIVED_COLUMNS}
+    if row["plain_text"] is None and row["content"]:
+        # Not reached by the text backfill yet; derive it now since the row leaves the hot table
+        row["plain_text"] = content_to_plain_text(row["content"])
+        row["token_count"] = count_tokens(row["plain_text"])
+        row["token_estimator"] = token_estimator()
+    row["created_at"] = row["created_at"].isoformat() if row["created_at"] else None
+    return row
+
+def _decode_archive(archive: ChatMessageArchive) -> List[Dict[str, Any]]:
+    return json.loads(decompress(archive.codec, archive.payload))
+
+def _archived_messages(archive: ChatMessageArchive) -> List[ChatMessage]:
+    """Rebuilds detached ChatMessage objects from an archive block so callers cannot tell the tiers apart."""
+    messages = []
+    for row in _decode_archive(archive):
+        created_at = datetime.datetime.fromisoformat(row.pop("created_at")) if row.get("created_at") else None
+        messages.append(ChatMessage(chat_session_id=archive.chat_session_id, created_at=created_at, **row))
+    return messages
+
+async def _get_archive(db: AsyncSession, session_id: str) -> Optional[ChatMessageArchive]:
+    result = await db.execute(select(ChatMessageArchive).filter(ChatMessageArchive.chat_session_id == session_id))
+    return result.scalars().first()
+
 async def get_chat_messages(db: AsyncSession, session_id: str):
+    """All messages of a session, oldest first: the archived block (if any) followed by the hot rows."""
     result = await db.execute(
         select(ChatMessage)
         .filter(ChatMessage.chat_session_id == session_id)
         .order_by(ChatMessage.created_at)
     )
-    return result.scalars().all()
+    hot = result.scalars().all()
+    archive = await _get_archive(db, session_id)
+    if archive is None:
+        return hot
+    # Everything in the block predates the hot rows: messages only move to the archive once written
+    return _archived_messages(archive) + list(hot)
+
+RESPONSE_COLUMNS = ("id", "chat_session_id", "role", "content", "created_at")
+
+async def get_chat_message_dicts(db: AsyncSession, session_id: str) -> List[Dict[str, Any]]:
+    """Like get_chat_messages, but as plain ChatMessageResponse-shaped dicts read column by column.
+
+    For the session read endpoint: no ORM identity map or Pydantic models per message. Archived
+    created_at values stay ISO strings, which serialize the same as the datetimes of hot rows.
+    """
+    result = await db.execute(
+        select(*(getattr(ChatMessage, column) for column in RESPONSE_COLUMNS))
+        .filter(ChatMessage.chat_session_id == session_id)
+        .order_by(ChatMessage.created_at)
+    )
+    hot = [dict(row._mapping) for row in result]
+    archive = await _get_archive(db, session_id)
+    if archive is None:
+        return hot
+    archived = [
+        {"id": row["id"], "chat_session_id": session_id, "role": row["role"], "content": row["content"], "created_at": row["created_at"]}
+        for row in _decode_archive(archive)
+    ]
+    return archived + hot
+
+async def get_chat_history(db: AsyncSession, session_id: str, max_tokens: Optional[int] = None):
+    """Loads (role, plain_text, content) rows for the agent's history, oldest first.
+
+    Only the narrow text columns are read; content is returned just for rows the backfill has not
+    reached yet. With max_tokens, the newest messages whose running token total fits are kept,
+    using a window sum in SQL.
+    """
+    legacy_content = case((ChatMessage.plain_text.is_(None), ChatMessage.content), else_=null()).label("content")
+    order = (ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    running_tokens = func.sum(func.coalesce(ChatMessage.token_count, 0)).over(order_by=order).label("running_tokens")
+    hot_count = func.count().over().label("hot_count")
+    window = (
+        select(ChatMessage.id, ChatMessage.created_at, ChatMessage.role, ChatMessage.plain_text, legacy_content, running_tokens, hot_count)
+        .filter(ChatMessage.chat_session_id == session_id)
+        .subquery()
+    )
+    query = select(window.c.role, window.c.plain_text, window.c.content, window.c.running_tokens, window.c.hot_count)
+    if max_tokens:
+        query = query.filter(window.c.running_tokens <= max_tokens)
+    result = await db.execute(query.order_by(window.c.created_at, window.c.id))
+    rows = list(result.all())
+
+    if rows and len(rows) < rows[0].hot_count:
+        return rows
+    if not rows and max_tokens:
+        # Either the session has no hot rows or its newest message alone is over the budget
+        has_hot = await db.execute(select(ChatMessage.id).filter(ChatMessage.chat_session_id == session_id).limit(1))
+        if has_hot.first() is not None:
+            return rows
+    archive = await _get_archive(db, session_id)
+    if archive is None:
+        return rows
+    remaining = max_tokens - (rows[0].running_tokens if rows else 0) if max_tokens else None
+    archived: List[ChatMessage] = []
+    for message in reversed(_archived_messages(archive)):
+        if remaining is not None:
+            remaining -= message.token_count or 0
+            if remaining < 0:
+                break
+        archived.append(message)
+    return archived[::-1] + rows
+
+async def archive_session_messages(db: AsyncSession, session_id: str) -> int:
+    """Moves a session's hot messages into its compressed archive block; returns how many moved.
+
+    The block is rewritten with the previously archived rows plus the new ones, and the hot rows are
+    deleted by ID in the same transaction, so a message written meanwhile simply stays hot.
+    """
+    # The newest row in the table always stays hot: SQLite hands out max(id) + 1 for new rows, and
+    # archived IDs must never be reused
+    newest_id = select(func.max(ChatMessage.id)).scalar_subquery()
+    result = await db.execute(
+        select(ChatMessage)
+        .filter(ChatMessage.chat_session_id == session_id)
+        .filter(ChatMessage.id < newest_id)
+        .order_by(ChatMessage.created_at, ChatMessage.id)
+    )
+    hot = result.scalars().all()
+    if not hot:
+        return 0
+    archive = await _get_archive(db, session_id)
+    rows = (_decode_archive(archive) if archive else []) + [_archive_row(m) for m in hot]
+    raw = json.dumps(rows, separators=(",", ":")).encode()
+    codec, payload = compress(raw)
+    if archive is None:
+        archive = ChatMessageArchive(chat_session_id=session_id)
+        db.add(archive)
+    archive.codec = codec
+    archive.payload = payload
+    archive.raw_size = len(raw)
+    archive.message_count = len(rows)
+    await db.execute(delete(ChatMessage).where(ChatMessage.id.in_([m.id for m in hot])))
+    await db.commit()
+    return len(hot)
+
+async def get_inactive_session_ids(db: AsyncSession, idle_before: datetime.datetime, limit: int) -> List[str]:
+    """Sessions with hot messages whose last message is older than idle_before."""
+    result = await db.execute(
+        select(ChatSession.id)
+        .filter(ChatSession.last_message_at < idle_before)
+        .filter(select(ChatMessage.id).filter(ChatMessage.chat_session_id == ChatSession.id).exists())
+        .order_by(ChatSession.last_message_at)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+async def backfill_message_text(db: AsyncSession, batch_size: int = 500) -> int:
+    """Fills plain_text and token_count for one batch of older rows; returns how many were updated."""
+    result = await db.execute(
+        select(ChatMessage.id, ChatMessage.content)
+        .filter(ChatMessage.plain_text.is_(None))
+        .order_by(ChatMessage.id)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+    updates = []
+    for row in rows:
+        plain_text = content_to_plain_text(row.content) if row.content else ""
+        updates.append({"id": row.id, "plain_text": plain_text, "token_count": count_tokens(plain_text), "token_estimator": token_estimator()})
+    await db.execute(update(ChatMessage), updates)
+    await db.commit()
+    return len(updates)
+
+async def backfill_token_counts(db: AsyncSession, after_id: int = 0, batch_size: int = 500) -> Optional[int]:
+    """Recounts one batch of token counts made by the length fallback (or not recorded) with tiktoken.
+
+    Only runs when tiktoken is available, since the fallback is never the better count. Scans by ID
+    after after_id and returns the last ID seen, or None when done.
+    """
+    if token_estimator() != TIKTOKEN_ESTIMATOR:
+        return None
+    result = await db.execute(
+        select(ChatMessage.id, ChatMessage.plain_text)
+        .filter(ChatMessage.id > after_id)
+        .filter(ChatMessage.plain_text.is_not(None))
+        .filter((ChatMessage.token_estimator.is_(None)) | (ChatMessage.token_estimator != TIKTOKEN_ESTIMATOR))
+        .order_by(ChatMessage.id)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    updates = [{"id": row.id, "token_count": count_tokens(row.plain_text), "token_estimator": TIKTOKEN_ESTIMATOR} for row in rows]
+    await db.execute(update(ChatMessage), updates)
+    await db.commit()
+    return rows[-1].id
+
+async def backfill_react_code(db: AsyncSession, after_id: int = 0, batch_size: int = 200) -> Optional[int]:
+    """Moves inline ReactBlock code of one batch of older AI messages into code_blobs.
+
+    Scans by ID after after_id (the LIKE is only a pre-filter) and returns the last ID seen, or None when done.
+    """
+    result = await db.execute(
+        select(ChatMessage.id, ChatMessage.content)
+        .filter(ChatMessage.id > after_id)
+        .filter(ChatMessage.role == "ai")
+        .filter(cast(ChatMessage.content, String).like('%"code": %'))
+        .order_by(ChatMessage.id)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    updates = []
+    for row in rows:
+        if not isinstance(row.content, dict):
+            continue
+        content = await dedupe_react_code(db, row.content)
+        if content is not row.content:
+            updates.append({"id": row.id, "content": content})
+    if updates:
+        await db.execute(update(ChatMessage), updates)
+    await db.commit()
+    return rows[-1].id
+
+async def get_code_blob(db: AsyncSession, hash: str) -> Optional[CodeBlob]:
+    result = await db.execute(select(CodeBlob).filter(CodeBlob.hash == hash))
+    return result.scalars().first()
+
+async def backfill_session_stats(db: AsyncSession) -> int:
+    """Computes message_count and the last-message fields for sessions created before they existed.
+
+    Sessions are picked by their stats_backfilled marker rather than by last_message_at, and the
+    count is taken from chat_messages, so a message recorded on an old session before the backfill
+    reaches it cannot leave its count stuck.
+    """
+    session_messages = ChatMessage.chat_session_id == ChatSession.id
+    newest_first = (ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    hot_count = select(func.count(ChatMessage.id)).filter(session_messages).scalar_subquery()
+    archived_count = (
+        select(ChatMessageArchive.message_count)
+        .filter(ChatMessageArchive.chat_session_id == ChatSession.id)
+        .scalar_subquery()
+    )
+    last_text = select(ChatMessage.plain_text).filter(session_messages).order_by(*newest_first).limit(1).scalar_subquery()
+    last_at = select(ChatMessage.created_at).filter(session_messages).order_by(*newest_first).limit(1).scalar_subquery()
+    result = await db.execute(
+        update(ChatSession)
+        .where(ChatSession.stats_backfilled.is_(None))
+        .values(
+            message_count=hot_count + func.coalesce(archived_count, 0),
+            # Fully archived sessions have no hot row to derive these from, so they keep their values
+            last_message_preview=func.coalesce(func.substr(last_text, 1, PREVIEW_LENGTH), ChatSession.last_message_preview),
+            last_message_at=func.coalesce(last_at, ChatSession.last_message_at),
+            stats_backfilled=1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount or 0
 
 async def get_user_sessions(db: AsyncSession, user_id: int):
     result = await db.execute(
@@ -59,12 +415,86 @@ async def get_user_sessions(db: AsyncSession, user_id: int):
     return result.scalars().all()
 
 async def add_user_message_to_session(db: AsyncSession, session_id: str, content: str):
-    user_message = ChatMessage(
-        chat_session_id=session_id,
-        role="user",
-        content={"text": content}
-    )
-    db.add(user_message)
-    await db.commit()
+    user_message = _new_message(session_id, "user", {"text": content})
+    await _record_message(db, user_message)
+    await db.flush()
     await db.refresh(user_message)
+    await db.commit()
     return user_message
+
+async def remove_message(db: AsyncSession, session_id: str, message_id: int) -> None:
+    """Deletes a message left by a request that failed before it finished and rolls back its session's counters."""
+    result = await db.execute(delete(ChatMessage).where(ChatMessage.id == message_id, ChatMessage.chat_session_id == session_id))
+    if result.rowcount:
+        session_messages = ChatMessage.chat_session_id == ChatSession.id
+        newest_first = (ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        last_text = select(ChatMessage.plain_text).filter(session_messages).order_by(*newest_first).limit(1).scalar_subquery()
+        last_at = select(ChatMessage.created_at).filter(session_messages).order_by(*newest_first).limit(1).scalar_subquery()
+        await db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(
+                message_count=ChatSession.message_count - 1,
+                last_message_preview=func.coalesce(func.substr(last_text, 1, PREVIEW_LENGTH), ChatSession.last_message_preview),
+                last_message_at=func.coalesce(last_at, ChatSession.last_message_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+def _utc_now() -> datetime.datetime:
+    # Matches server_default=func.now(), which is naive UTC on SQLite
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+async def _get_idempotency_key(db: AsyncSession, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    result = await db.execute(select(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+    return result.scalars().first()
+
+async def claim_idempotency_key(db: AsyncSession, user_id: int, key: str, request_hash: str) -> Optional[IdempotencyKey]:
+    """Records a pending key and returns None, or returns the existing record when the key is taken.
+
+    The primary key makes the claim atomic across workers. An expired record, or one left pending
+    by a request that died, is replaced. Raises the IntegrityError when the insert keeps failing
+    without a record to return (e.g. an unknown user_id), rather than reporting a claim.
+    """
+    for _ in range(2):
+        db.add(IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash))
+        try:
+            await db.commit()
+            return None
+        except IntegrityError as e:
+            await db.rollback()
+            error = e
+        existing = await _get_idempotency_key(db, user_id, key)
+        if existing is None:
+            continue
+        age = _utc_now() - existing.created_at
+        abandoned = existing.response is None and age > datetime.timedelta(seconds=config.IDEMPOTENCY_PENDING_SECONDS)
+        if not abandoned and age <= datetime.timedelta(hours=config.IDEMPOTENCY_TTL_HOURS):
+            return existing
+        await db.delete(existing)
+        await db.commit()
+    raise error
+
+async def complete_idempotency_key(db: AsyncSession, user_id: int, key: str, response: Dict[str, Any]) -> None:
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(response=response)
+    )
+    await db.commit()
+
+async def release_idempotency_key(db: AsyncSession, user_id: int, key: str) -> None:
+    """Drops a pending key after a failed request so a retry runs it again."""
+    await db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.response.is_(None))
+    )
+    await db.commit()
+
+async def purge_idempotency_keys(db: AsyncSession) -> int:
+    """Deletes keys older than IDEMPOTENCY_TTL_HOURS; returns how many were removed."""
+    expired_before = _utc_now() - datetime.timedelta(hours=config.IDEMPOTENCY_TTL_HOURS)
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < expired_before))
+    await db.commit()
+    return result.rowcount or 0
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema.document import Document # type: ignore
+
+MANIFEST_DIR = os.path.join(os.path.dirname(__file__), "manifests")
+MANIFEST_VERSION = 1
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """On-disk record of which documents and pages of one source are already in Chroma.
+
+    Layout of manifests/<resource_name>.json:
+        documents: {source: {"hash": file hash or None, "complete": bool, "pages": {page: content hash}}}
+        last_batch: {"index": int, "last_chunk_id": str, "committed_at": iso timestamp}
+
+    A page is only recorded once the batch holding its final chunk has been upserted, so an
+    interrupted run resumes from the first page that was not fully committed.
+    """
+
+    def __init__(self, resource_name: str, directory: str = MANIFEST_DIR):
+        self.resource_name = resource_name
+        self.path = os.path.join(directory, f"{resource_name}.json")
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.last_batch: Optional[Dict[str, Any]] = None
+        self._open_page: Optional[Tuple[str, str, str]] = None
+        self._started: List[str] = []
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable manifest {self.path}: {e}")
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.documents = data.get("documents", {})
+        self.last_batch = data.get("last_batch")
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "resource_name": self.resource_name,
+                "documents": self.documents,
+                "last_batch": self.last_batch,
+            }, f)
+        # Atomic replace so a crash never leaves a half-written manifest behind
+        os.replace(tmp_path, self.path)
+
+    def reset(self) -> None:
+        self.documents = {}
+        self.last_batch = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def document_status(self, source: str, file_hash: Optional[str]) -> str:
+        """Returns 'new', 'changed', 'partial' or 'unchanged' for a document before it is parsed."""
+        entry = self.documents.get(source)
+        if entry is None:
+            return "new"
+        if file_hash is not None and entry.get("hash") != file_hash:
+            return "changed"
+        return "unchanged" if entry.get("complete") else "partial"
+
+    def start_document(self, source: str, file_hash: Optional[str], reset: bool = False) -> None:
+        entry = self.documents.get(source)
+        if entry is None or reset:
+            entry = self.documents[source] = {"hash": file_hash, "complete": False, "pages": {}}
+        entry["hash"] = file_hash
+        entry["complete"] = False
+        self._started.append(source)
+
+    def forget_page(self, source: str, page: Any) -> None:
+        """Drops one page's record so it is re-ingested; its document stays incomplete until finish()."""
+        entry = self.documents.get(source)
+        if entry is None:
+            return
+        entry["pages"].pop(str(page), None)
+        entry["complete"] = False
+        if source not in self._started:
+            self._started.append(source)
+
+    def page_status(self, source: str, page: Any, content_hash: str) -> str:
+        """Returns 'new', 'changed' or 'done' for a parsed page."""
+        recorded = self.documents.get(source, {}).get("pages", {}).get(str(page))
+        if recorded is None:
+            return "new"
+        return "done" if recorded == content_hash else "changed"
+
+    def _complete_page(self, page_key: Tuple[str, str, str]) -> None:
+        source, page, content_hash = page_key
+        entry = self.documents.setdefault(source, {"hash": None, "complete": False, "pages": {}})
+        entry["pages"][page] = content_hash
+
+    def record_batch(self, batch: List[Document]) -> None:
+        """Marks every page whose last chunk is in a committed batch and persists the manifest."""
+        for chunk in batch:
+            key = (chunk.metadata.get("source"), str(chunk.metadata.get("page")), chunk.metadata.get("content_hash", ""))
+            if self._open_page is not None and key != self._open_page:
+                self._complete_page(self._open_page)
+            self._open_page = key
+        index = (self.last_batch or {}).get("index", -1) + 1
+        self.last_batch = {
+            "index": index,
+            "last_chunk_id": batch[-1].metadata.get("id") if batch else None,
+            "committed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.save()
+
+    def finish(self) -> None:
+        """Called after the final batch: closes the trailing page and marks started documents complete."""
+        if self._open_page is not None:
+            self._complete_page(self._open_page)
+            self._open_page = None
+        for source in self._started:
+            if source in self.documents:
+                self.documents[source]["complete"] = True
+        self._started = []
+        self.save()
@@ -3,36 +3,33 @@ import sys
 import os
 import json
 import socket
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Deque, Callable
 
 from bs4 import BeautifulSoup # type: ignore
 from langchain_community.document_loaders import (
-    PyPDFDirectoryLoader, # type: ignore
     PyPDFLoader, # type: ignore
     UnstructuredURLLoader, # type: ignore
     RecursiveUrlLoader, # type: ignore
 )
 from langchain_chroma import Chroma # type: ignore
-from langchain_huggingface import HuggingFaceEmbeddings # type: ignore
 from langchain.schema.document import Document # type: ignore
 from langchain_text_splitters import RecursiveCharacterTextSplitter # type: ignore
 
-
-EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-SOURCES_PATH = os.path.join(os.path.dirname(__file__), "sources.json")
+# Allow running as `python data/populate_vectors.py` while sharing the backend's services package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import config # noqa: E402
+from services.embeddings import get_embedding_function # noqa: E402
+from data.ingest_manifest import IngestManifest, hash_file, hash_text # noqa: E402
 
 
-def get_embedding_function():
-    return HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
+SOURCES_PATH = os.path.join(os.path.dirname(__file__), "sources.json")
 
 
 def _is_chroma_available() -> bool:
-    host = "localhost"
-    port = 8001
+    host = config.CHROMA_HOST
+    port = config.CHROMA_PORT
     try:
         with socket.create_connection((str(host), int(port)), timeout=2.0):
             return True
@@ -42,8 +39,8 @@ def _is_chroma_available() -> bool:
 
 def _get_chroma_client(collection_name: Optional[str] = None) -> Chroma:
     kwargs: Dict[str, Any] = {
-        "host": "localhost",
-        "port": 8001,
+        "host": config.CHROMA_HOST,
+        "port": int(config.CHROMA_PORT),
         "embedding_function": get_embedding_function(),
     }
     if collection_name:
@@ -87,19 +84,81 @@ def list_sources() -> List[Dict[str, str]]:
     return [{"resource_name": s["resource_name"], "resource_description": s.get("resource_description", "")} for s in _read_sources_file()]
 
 
-def _load_from_pdf_path(path: str) -> List[Document]:
-    docs: List[Document] = []
+# Same default as the background indexer, so CLI and API ingests have the same peak memory
+DEFAULT_BATCH_SIZE = config.INGEST_BATCH_SIZE
+
+
+def _iter_pdf_files(path: str, skip_file: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
     if os.path.isdir(path):
-        loader = PyPDFDirectoryLoader(path)
-        return loader.load()
-    if path.endswith(".pdf") and os.path.exists(path):
-        loader = PyPDFLoader(path)
-        return loader.load()
-    print(f"Skipping non-existent or non-pdf path: {path}")
-    return docs
+        pdf_paths = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(".pdf")]
+    elif path.endswith(".pdf") and os.path.exists(path):
+        pdf_paths = [path]
+    else:
+        print(f"Skipping non-existent or non-pdf path: {path}")
+        return
+    for pdf_path in pdf_paths:
+        # Checked before the file is parsed so unchanged PDFs cost only a hash
+        if skip_file and skip_file(pdf_path):
+            print(f"Skipping unchanged pdf: {pdf_path}")
+            continue
+        yield pdf_path
 
 
-def _load_from_web_url(url: str) -> List[Document]:
+def _iter_pdf_pages(path: str, skip_file: Optional[Callable[[str], bool]] = None) -> Iterator[Document]:
+    """Yields one Document per page without holding the rest of the file (or directory) in memory."""
+    for pdf_path in _iter_pdf_files(path, skip_file):
+        try:
+            yield from PyPDFLoader(pdf_path).lazy_load()
+        except Exception as e:
+            print(f"Error loading pdf {pdf_path}: {e}")
+
+
+_worker_readers: Dict[str, Any] = {}
+
+
+def _extract_pdf_page(pdf_path: str, page_number: int, total_pages: int) -> Document:
+    # Runs in a worker process; each worker keeps its own reader per file
+    from pypdf import PdfReader # type: ignore
+    reader = _worker_readers.get(pdf_path)
+    if reader is None:
+        _worker_readers.clear()
+        reader = _worker_readers[pdf_path] = PdfReader(pdf_path)
+    text = reader.pages[page_number].extract_text() or ""
+    return Document(
+        page_content=text.strip(),
+        metadata={"source": pdf_path, "page": page_number, "total_pages": total_pages},
+    )
+
+
+def _iter_pdf_pages_parallel(path: str, workers: int, skip_file: Optional[Callable[[str], bool]] = None) -> Iterator[Document]:
+    """Extracts pages across a process pool, keeping at most a few pages per worker in flight.
+
+    Pages are yielded in (file, page) order so chunk IDs stay identical to the sequential loader.
+    """
+    from pypdf import PdfReader # type: ignore
+
+    def page_tasks() -> Iterator[Tuple[str, int, int]]:
+        for pdf_path in _iter_pdf_files(path, skip_file):
+            try:
+                total_pages = len(PdfReader(pdf_path).pages)
+            except Exception as e:
+                print(f"Error loading pdf {pdf_path}: {e}")
+                continue
+            for page_number in range(total_pages):
+                yield pdf_path, page_number, total_pages
+
+    max_in_flight = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Future] = deque()
+        for task in page_tasks():
+            pending.append(pool.submit(_extract_pdf_page, *task))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _iter_web_documents(url: str) -> Iterator[Document]:
     try:
         if "kubernetes.io/docs" in url:
             loader = RecursiveUrlLoader(
@@ -108,43 +167,75 @@ def _load_from_web_url(url: str) -> List[Document]:
                 extractor=lambda x: BeautifulSoup(x, "html.parser").text,
                 prevent_outside=True,
             )
-            return loader.load()
         else:
-            web_document_loader = UnstructuredURLLoader(urls=[url])
-            return web_document_loader.load()
+            loader = UnstructuredURLLoader(urls=[url])
+        yield from loader.lazy_load()
     except Exception as e:
         print(f"Error loading web source {url}: {e}")
-        return []
 
 
-def load_documents_for_source(resource_name: str) -> List[Document]:
+def _load_from_pdf_path(path: str) -> List[Document]:
+    return list(_iter_pdf_pages(path))
+
+
+def _load_from_web_url(url: str) -> List[Document]:
+    return list(_iter_web_documents(url))
+
+
+def iter_documents_for_source(resource_name: str, workers: int = 0, skip_file: Optional[Callable[[str], bool]] = None) -> Iterator[Document]:
+    """Lazily yields the documents of one source, tagged with the source's metadata.
+
+    When workers > 1, PDF directories are extracted page by page across a process pool.
+    skip_file is consulted for each PDF before it is opened.
+    """
     src_meta = next((s for s in _read_sources_file() if s["resource_name"] == resource_name), None)
     if not src_meta:
         print(f"No source configured with resource_name='{resource_name}'")
-        return []
-    docs: List[Document] = []
+        return
+    docs: Iterator[Document] = iter(())
     if src_meta["type"] == "pdf":
-        docs = _load_from_pdf_path(src_meta["path"]) or []
+        if workers > 1 and os.path.isdir(src_meta["path"]):
+            docs = _iter_pdf_pages_parallel(src_meta["path"], workers, skip_file)
+        else:
+            docs = _iter_pdf_pages(src_meta["path"], skip_file)
     elif src_meta["type"] == "web":
-        docs = _load_from_web_url(src_meta["path"]) or []
+        docs = _iter_web_documents(src_meta["path"])
     for d in docs:
         d.metadata = d.metadata or {}
         d.metadata["resource_name"] = src_meta["resource_name"]
         d.metadata["resource_description"] = src_meta.get("resource_description", "")
-    return docs
+        yield d
 
 
-def split_documents(documents: List[Document]) -> List[Document]:
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=80,
+def load_documents_for_source(resource_name: str) -> List[Document]:
+    return list(iter_documents_for_source(resource_name))
+
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 80
+
+
+def _get_text_splitter(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         length_function=len,
         is_separator_regex=False,
     )
-    return text_splitter.split_documents(documents)
 
 
-def calculate_chunk_ids(chunks: List[Document]) -> List[Document]:
+def split_documents(documents: List[Document]) -> List[Document]:
+    return _get_text_splitter().split_documents(documents)
+
+
+def iter_chunks(documents: Iterable[Document], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[Document]:
+    """Splits documents one at a time so only the current document's chunks are in memory."""
+    text_splitter = _get_text_splitter(chunk_size, chunk_overlap)
+    for document in documents:
+        yield from text_splitter.split_documents([document])
+
+
+def iter_chunk_ids(chunks: Iterable[Document]) -> Iterator[Document]:
     last_page_id: str | None = None
     current_chunk_index = 0
     for chunk in chunks:
@@ -158,43 +249,129 @@ def calculate_chunk_ids(chunks: List[Document]) -> List[Document]:
         chunk_id = f"{current_page_id}:{current_chunk_index}"
         last_page_id = current_page_id
         chunk.metadata["id"] = chunk_id
-    return chunks
+        yield chunk
 
 
-def add_to_chroma(chunks: List[Document], collection_name: str) -> Tuple[int, int]:
-    db = _get_chroma_client(collection_name=collection_name)
-    chunks_with_ids = calculate_chunk_ids(chunks)
-    existing_items = db.get(include=[])
-    existing_ids = set(existing_items.get("ids", []))
-    new_chunks: List[Document] = [chunk for chunk in chunks_with_ids if chunk.metadata.get("id") not in existing_ids]
+def calculate_chunk_ids(chunks: List[Document]) -> List[Document]:
+    return list(iter_chunk_ids(chunks))
+
+
+def _batched(items: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def add_to_chroma(
+    chunks: Iterable[Document],
+    collection_name: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    db: Optional[Chroma] = None,
+    on_batch: Optional[Callable[[List[Document]], None]] = None,
+) -> Tuple[int, int]:
+    """Embeds and upserts chunks batch by batch; returns (already present, newly added) counts.
+
+    Existing IDs are looked up per batch rather than loading the whole collection's IDs.
+    on_batch is called with each batch once it has been committed.
+    """
+    db = db or _get_chroma_client(collection_name=collection_name)
+    existing = 0
     added = 0
-    if new_chunks:
-        batch_size = 1000
-        for i in range(0, len(new_chunks), batch_size):
-            batch = new_chunks[i:i + batch_size]
-            new_chunk_ids = [chunk.metadata["id"] for chunk in batch]
-            db.add_documents(batch, ids=new_chunk_ids)
-            added += len(batch)
-    return len(existing_ids), added
-
-
-def populate_source(resource_name: str) -> int:
+    for batch in _batched(iter_chunk_ids(chunks), batch_size):
+        batch_ids = [chunk.metadata["id"] for chunk in batch]
+        existing_ids = set(db.get(ids=batch_ids, include=[]).get("ids", []))
+        new_chunks = [chunk for chunk in batch if chunk.metadata["id"] not in existing_ids]
+        existing += len(existing_ids)
+        if new_chunks:
+            db.add_documents(new_chunks, ids=[chunk.metadata["id"] for chunk in new_chunks])
+            added += len(new_chunks)
+        if on_batch:
+            on_batch(batch)
+    return existing, added
+
+
+def _pending_documents(documents: Iterable[Document], manifest: IngestManifest, db: Chroma, stats: Dict[str, int]) -> Iterator[Document]:
+    """Drops pages the manifest already holds and clears stale chunks of pages whose content changed."""
+    for d in documents:
+        source = d.metadata.get("source")
+        page = d.metadata.get("page")
+        content_hash = hash_text(d.page_content)
+        d.metadata["content_hash"] = content_hash
+        status = manifest.page_status(source, page, content_hash)
+        if status == "done":
+            stats["skipped"] += 1
+            continue
+        if status == "changed":
+            # Only this page is stale; earlier pages of the document were already skipped as done
+            db.delete(where={"source": source} if page is None else {"$and": [{"source": source}, {"page": page}]})
+            manifest.forget_page(source, page)
+        elif source not in manifest.documents:
+            manifest.start_document(source, None)
+        yield d
+
+
+def populate_source(
+    resource_name: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 0,
+    resume: bool = True,
+    on_batch: Optional[Callable[[List[Document]], None]] = None,
+) -> int:
+    """Ingests one source and returns 0 on success, 1 if Chroma is unreachable, 2 if nothing was found.
+
+    on_batch is called after each committed batch (and after the manifest is saved); raising from it
+    stops the run at a batch boundary.
+    """
     if not _is_chroma_available():
         print("⚠️ Chroma server is not reachable, skipping vector database population.")
         return 1
-    documents = load_documents_for_source(resource_name)
-    if not documents:
+    db = _get_chroma_client(collection_name=resource_name)
+    manifest = IngestManifest(resource_name)
+    if not resume:
+        manifest.reset()
+    elif manifest.last_batch and any(not d.get("complete") for d in manifest.documents.values()):
+        print(f"[{resource_name}] Resuming after batch {manifest.last_batch['index']} ({manifest.last_batch['last_chunk_id']}).")
+    stats = {"skipped": 0}
+
+    def skip_file(pdf_path: str) -> bool:
+        file_hash = hash_file(pdf_path)
+        status = manifest.document_status(pdf_path, file_hash)
+        if status == "unchanged":
+            stats["skipped"] += 1
+            return True
+        if status == "changed":
+            db.delete(where={"source": pdf_path})
+        manifest.start_document(pdf_path, file_hash, reset=status == "changed")
+        return False
+
+    def record_batch(batch: List[Document]) -> None:
+        manifest.record_batch(batch)
+        if on_batch:
+            on_batch(batch)
+
+    documents = _pending_documents(iter_documents_for_source(resource_name, workers=workers, skip_file=skip_file), manifest, db, stats)
+    existing, added = add_to_chroma(
+        iter_chunks(documents), collection_name=resource_name, batch_size=batch_size, db=db, on_batch=record_batch
+    )
+    manifest.finish()
+    if existing == 0 and added == 0 and stats["skipped"] == 0:
         print(f"No documents found for RAG population for source '{resource_name}'.")
         return 2
-    chunks = split_documents(documents)
-    existing, added = add_to_chroma(chunks, collection_name=resource_name)
-    print(f"[{resource_name}] Chroma existing docs: {existing}, newly added: {added}")
+    print(f"[{resource_name}] Chroma existing docs: {existing}, newly added: {added}, unchanged documents/pages skipped: {stats['skipped']}")
     return 0
 
 
 def main(argv: List[str]) -> int:
     parser = argparse.ArgumentParser(description="Populate Chroma collections by resource name.")
     parser.add_argument("resource_name", nargs="?", help="Name of the resource to populate. If omitted, populates all.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks embedded and upserted per batch; bounds peak memory.")
+    parser.add_argument("--workers", type=int, default=0, help="Extract pages of PDF directories across this many processes.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the ingestion manifest and recheck every document.")
     args = parser.parse_args(argv)
 
     if not _is_chroma_available():
@@ -202,7 +379,7 @@ def main(argv: List[str]) -> int:
         return 1
 
     if args.resource_name:
-        return populate_source(args.resource_name)
+        return populate_source(args.resource_name, batch_size=args.batch_size, workers=args.workers, resume=not args.no_resume)
 
     sources = list_sources()
     if not sources:
@@ -213,7 +390,7 @@ def main(argv: List[str]) -> int:
     for s in sources:
         rn = s.get("resource_name")
         if rn:
-            code = populate_source(rn)
+            code = populate_source(rn, batch_size=args.batch_size, workers=args.workers, resume=not args.no_resume)
             if code != 0:
                 overall_code = code
     return overall_code
@@ -0,0 +1,74 @@
+"""Moves messages of idle chat sessions out of chat_messages into compressed per-session blocks.
+
+Keeps the hot table (and its indexes) down to recently active sessions; crud.chat reads both tiers,
+so archived sessions load exactly as before. A session that becomes active again gets new hot rows,
+which the next run folds into its existing block.
+
+    python -m db.archive [--after-days 30] [--batch-size 100]
+"""
+import argparse
+import asyncio
+import datetime
+import sys
+from core import config
+from db.base import Base
+from db.session import AsyncSessionLocal, engine
+from db.migrations import add_missing_columns
+from crud import chat as chat_crud
+from models.user import User # noqa: F401  (registers the users table for create_all)
+
+async def archive_inactive_sessions(after_days: float = None, batch_size: int = None) -> int:
+    """Archives every session idle for after_days, batch_size sessions per query; returns messages moved."""
+    after_days = config.ARCHIVE_AFTER_DAYS if after_days is None else after_days
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    # last_message_at is written with the database clock, which is UTC on SQLite
+    idle_before = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(days=after_days)
+    moved = sessions = 0
+    while True:
+        batch_moved = 0
+        async with AsyncSessionLocal() as db:
+            session_ids = await chat_crud.get_inactive_session_ids(db, idle_before, batch_size)
+            for session_id in session_ids:
+                batch_moved += await chat_crud.archive_session_messages(db, session_id)
+                # One commit per session; let request handlers run in between
+                await asyncio.sleep(0)
+        moved += batch_moved
+        sessions += len(session_ids)
+        # A session holding the table's newest row keeps it hot and would be selected again
+        if len(session_ids) < batch_size or not batch_moved:
+            break
+    if moved:
+        print(f"✅ Archived {moved} messages from {sessions} inactive chat sessions.")
+    return moved
+
+async def run_archiver() -> None:
+    """Runs the tiering job (when enabled) and expires old idempotency keys every ARCHIVE_INTERVAL_SECONDS until cancelled."""
+    while True:
+        try:
+            if config.ARCHIVE_AFTER_DAYS > 0:
+                await archive_inactive_sessions()
+            async with AsyncSessionLocal() as db:
+                await chat_crud.purge_idempotency_keys(db)
+        except Exception as e:
+            print(f"⚠️ Chat archive run failed: {e}")
+        await asyncio.sleep(config.ARCHIVE_INTERVAL_SECONDS)
+
+async def _main(after_days: float, batch_size: int) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    moved = await archive_inactive_sessions(after_days, batch_size)
+    await engine.dispose()
+    return moved
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Archive messages of inactive chat sessions into compressed blocks.")
+    parser.add_argument("--after-days", type=float, default=config.ARCHIVE_AFTER_DAYS, help="Idle time before a session is archived.")
+    parser.add_argument("--batch-size", type=int, default=config.ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    moved = asyncio.run(_main(args.after_days, args.batch_size))
+    print(f"Done: {moved} messages archived.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,65 @@
+"""Backfills denormalized chat columns for rows written before those columns existed.
+
+Fills ChatMessage.plain_text/token_count, then each ChatSession's message_count and last-message fields,
+then moves inline ReactBlock code of older AI messages into code_blobs. Token counts made by the
+length fallback (or not recorded) are recounted once tiktoken is available.
+
+    python -m db.backfill [--batch-size 500]
+"""
+import argparse
+import asyncio
+import sys
+from db.base import Base
+from db.session import AsyncSessionLocal, engine
+from db.migrations import add_missing_columns
+from crud import chat as chat_crud
+from models.user import User # noqa: F401  (registers the users table for create_all)
+
+async def backfill(batch_size: int = 500) -> int:
+    """Fills message text batch by batch (each commits on its own), then the per-session stats."""
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            updated = await chat_crud.backfill_message_text(db, batch_size)
+        total += updated
+        if updated < batch_size:
+            break
+        # Let request handlers run between batches when this runs inside the app
+        await asyncio.sleep(0)
+    if total:
+        print(f"✅ Backfilled plain text for {total} chat messages.")
+    # Session previews are derived from plain_text, so they go second
+    async with AsyncSessionLocal() as db:
+        sessions = await chat_crud.backfill_session_stats(db)
+    if sessions:
+        print(f"✅ Backfilled message stats for {sessions} chat sessions.")
+    last_id = 0
+    while last_id is not None:
+        async with AsyncSessionLocal() as db:
+            last_id = await chat_crud.backfill_react_code(db, last_id, batch_size)
+        await asyncio.sleep(0)
+    last_id = 0
+    while last_id is not None:
+        async with AsyncSessionLocal() as db:
+            last_id = await chat_crud.backfill_token_counts(db, last_id, batch_size)
+        await asyncio.sleep(0)
+    return total
+
+async def _main(batch_size: int) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    total = await backfill(batch_size)
+    await engine.dispose()
+    return total
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Backfill denormalized chat message and session columns.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+    total = asyncio.run(_main(args.batch_size))
+    print(f"Done: {total} messages updated.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
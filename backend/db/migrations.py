@@ -0,0 +1,28 @@
+from typing import List
+from sqlalchemy import inspect, text # type: ignore
+from sqlalchemy.engine import Connection # type: ignore
+from db.base import Base
+
+def add_missing_columns(conn: Connection) -> List[str]:
+    """Adds columns that exist on the models but not yet in the database.
+
+    create_all only creates missing tables, so new nullable (or server-defaulted) columns on
+    existing tables are added here with ALTER TABLE. Returns the "table.column" names added.
+    """
+    inspector = inspect(conn)
+    added: List[str] = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            conn.execute(text(ddl))
+            added.append(f"{table.name}.{column.name}")
+    if added:
+        print(f"✅ Added database columns: {', '.join(added)}")
+    return added
@@ -1,10 +1,47 @@
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import time
+from typing import Dict
+from fastapi import Request, Response # type: ignore
+from sqlalchemy import event # type: ignore
+from sqlalchemy.engine import make_url # type: ignore
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from dotenv import load_dotenv
-from core.config import DATABASE_URL, SQLALCHEMY_ECHO
+from core import config
+from core.config import DATABASE_URL, READ_DATABASE_URL, READ_YOUR_WRITES_SECONDS, SQLALCHEMY_ECHO
+
+def sqlite_file_path(url: str):
+    """The database file of a file-backed SQLite URL, or None for other backends and in-memory SQLite."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:") or "mode=memory" in url:
+        return None
+    return parsed.database
+
+def _apply_sqlite_pragmas(engine: AsyncEngine, read_only: bool) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+        # WAL lets readers run alongside the single writer; NORMAL only syncs at checkpoints under WAL
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+SQLITE_FILE = sqlite_file_path(DATABASE_URL)
 
 # Create the asynchronous engine
-engine = create_async_engine(DATABASE_URL, echo=SQLALCHEMY_ECHO)
+if SQLITE_FILE:
+    os.makedirs(os.path.dirname(os.path.abspath(SQLITE_FILE)), exist_ok=True)
+    # SQLite allows one writer at a time; a single pooled connection queues writes in-process
+    # instead of letting them fail with "database is locked"
+    engine = create_async_engine(DATABASE_URL, echo=SQLALCHEMY_ECHO, pool_size=1, max_overflow=0)
+    _apply_sqlite_pragmas(engine, read_only=False)
+else:
+    engine = create_async_engine(DATABASE_URL, echo=SQLALCHEMY_ECHO)
 
 # Create a session maker to manage sessions
 AsyncSessionLocal = async_sessionmaker(
@@ -13,6 +50,65 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Read replica for history browsing; falls back to the primary when not configured. With file-backed
+# SQLite and no replica, reads get their own pool of read-only connections to the same WAL database.
+if READ_DATABASE_URL:
+    read_engine = create_async_engine(READ_DATABASE_URL, echo=SQLALCHEMY_ECHO)
+elif SQLITE_FILE:
+    read_engine = create_async_engine(DATABASE_URL, echo=SQLALCHEMY_ECHO, pool_size=config.SQLITE_READ_POOL_SIZE, max_overflow=0)
+    _apply_sqlite_pragmas(read_engine, read_only=True)
+else:
+    read_engine = engine
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if read_engine is not engine else AsyncSessionLocal
+
+# Carried by the client so a read that lands on another worker (or process) still sees the write
+LAST_WRITE_COOKIE = "last_write_at"
+LAST_WRITE_HEADER = "X-Last-Write-At"
+
+class RecentWrites:
+    """Remembers which sessions/users this process wrote in the last READ_YOUR_WRITES_SECONDS.
+
+    Only covers reads served by the same worker; the last-write cookie/header covers the rest.
+    """
+
+    def __init__(self, window: float, max_entries: int = 10000):
+        self.window = window
+        self.max_entries = max_entries
+        self._written: Dict[str, float] = {}
+
+    def mark(self, **keys) -> None:
+        now = time.monotonic()
+        if len(self._written) >= self.max_entries:
+            self._written = {k: t for k, t in self._written.items() if now - t < self.window}
+        for name, value in keys.items():
+            self._written[f"{name}:{value}"] = now
+
+    def is_recent(self, **keys) -> bool:
+        now = time.monotonic()
+        return any(now - self._written.get(f"{name}:{value}", -self.window) < self.window for name, value in keys.items())
+
+recent_writes = RecentWrites(READ_YOUR_WRITES_SECONDS)
+
+def remember_write(response: Response, **keys) -> None:
+    """Marks keys as just written and hands the client the write time to send back with its next reads."""
+    recent_writes.mark(**keys)
+    if not READ_DATABASE_URL:
+        return
+    written_at = f"{time.time():.3f}"
+    response.headers[LAST_WRITE_HEADER] = written_at
+    response.set_cookie(LAST_WRITE_COOKIE, written_at, max_age=max(1, int(READ_YOUR_WRITES_SECONDS)), httponly=True, samesite="lax")
+
+def _client_wrote_recently(request: Request) -> bool:
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return value is not None and time.time() - float(value) < READ_YOUR_WRITES_SECONDS
+    except ValueError:
+        return False
+
 # Dependency function to get an async database session
 async def get_db_session():
     db = AsyncSessionLocal()
@@ -20,3 +116,15 @@ async def get_db_session():
         yield db
     finally:
         await db.close()
+
+async def get_read_db_session(request: Request):
+    """Session for read-only endpoints: the replica, unless the client or the session_id/user_id in the path just wrote."""
+    keys = {name: value for name, value in request.path_params.items() if name in ("session_id", "user_id")}
+    # SQLite readers share the WAL file with the writer and never lag, so only a real replica needs this
+    lagging = READ_DATABASE_URL and (_client_wrote_recently(request) or recent_writes.is_recent(**keys))
+    session_factory = AsyncSessionLocal if lagging else ReadSessionLocal
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        await db.close()
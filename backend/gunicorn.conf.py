@@ -0,0 +1,29 @@
+"""Prefork server mode: several uvicorn workers sharing the state preloaded by the master.
+
+    gunicorn -c gunicorn.conf.py
+
+WEB_CONCURRENCY sets the worker count. Each worker still runs the app lifespan (LLM, MCP sessions,
+agent), but the embedding model and tool schemas come from the master's memory, and the singleton
+jobs (archiver, chat backfill, indexer) run in one worker only; see services/prefork.py. With the
+file-backed SQLite default each worker has its own writer connection, so WEB_CONCURRENCY > 1 falls
+back to busy_timeout for write contention (SQLITE_BUSY_TIMEOUT_MS scales with the worker count) and
+SQLITE_BUSY can still surface under heavy concurrent writes; point DATABASE_URL at Postgres for that.
+"""
+import os
+
+wsgi_app = "main:app"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# core.config sizes the SQLite busy_timeout from this
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn_worker.UvicornWorker"
+# Import the app in the master so forked workers share its modules and loaded models
+preload_app = True
+# An agent turn may run for AGENT_MAX_SECONDS before the response is written
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    from services.prefork import preload
+    preload()
@@ -3,40 +3,141 @@ from contextlib import asynccontextmanager
 from core import config
 from db.base import Base
 from db.session import engine
+from db.migrations import add_missing_columns
+from db.backfill import backfill as backfill_chat_columns
+from db.archive import run_archiver
 from api.v1.api import api_router
+from api.v1.endpoints import metrics as metrics_endpoint
+from api.middleware import CompressionMiddleware
 from services.llm import initialize_llm
-from services.tools import setup_tools
-from services.agent import create_mcp_agent_executor
-import os
+from services.tools import create_mcp_pool, setup_rag_tools
+from services.agent import create_mcp_agent_executor, swap_agent_tools
+from services.indexer import IndexJobRunner
+from services.embedding_batcher import close_embedding_batcher
+from services.embeddings import get_embedding_function
+from services.rag import warm_chroma_clients, _is_chroma_available
+from services.startup import StartupGraph
+from services.message_converter import count_tokens
+from services.mcp_schema_cache import cancel_refreshes, load_server_tools
+from services.prefork import acquire_leader_lock
+from services.tracing import close_trace_writer
+import asyncio
+import functools
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
-import logging
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initializes LLM, tools, and the agent executor when the application starts."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """Initializes LLM, tools, and the agent executor when the application starts.
 
-    try:
-        llm_instance = initialize_llm(
+    Independent steps (DB schema, LLM, MCP discovery per server, RAG tools, embedding warmup and
+    Chroma handles) run concurrently through a StartupGraph, each with its own timeout. MCP tools
+    come from the local schema cache when present and are refreshed in the background. The server
+    starts accepting requests once the foreground steps finish; /api/v1/health/ready reports the rest.
+
+    Under a preforking server only the worker holding the leader lock runs the singleton jobs: the
+    chat backfill, the archiver, the indexer and writes to the MCP schema cache file.
+    """
+    leader = acquire_leader_lock()
+    graph = StartupGraph()
+    app.state.startup = graph
+    app.state.llm_instance = None
+    app.state.agent_executor = None
+    app.state.mcp_pool = create_mcp_pool()
+    app.state.mcp_tools = []
+    app.state.rag_tools = []
+
+    async def create_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(add_missing_columns)
+
+    async def init_llm():
+        app.state.llm_instance = await asyncio.to_thread(
+            initialize_llm,
             config.OPENROUTER_API_KEY, 
             config.OPENROUTER_BASE_URL, 
             config.LLM_MODEL_NAME
         )
-    except ValueError as e:
-        logging.error(f"❌ Error initializing LLM: {e}")
-        llm_instance = None
+        if app.state.llm_instance is None:
+            raise ValueError("LLM could not be created.")
+
+    async def init_rag_tools():
+        app.state.rag_tools = await setup_rag_tools(app.state.llm_instance)
+        return [tool.name[len("RAG_"):] for tool in app.state.rag_tools]
 
-    tools_list = await setup_tools(llm_instance)
+    async def warm_embeddings():
+        await asyncio.to_thread(get_embedding_function().embed_query, "warmup")
 
-    if llm_instance:
-        app.state.llm_instance = llm_instance  # Store the LLM instance in the app state
-        app.state.agent_executor = create_mcp_agent_executor(llm_instance, tools_list)
+    async def warm_tokenizer():
+        # The tokenizer may download its encoding on first use; do that before the first message write
+        await asyncio.to_thread(count_tokens, "warmup")
+
+    async def warm_chroma():
+        if not await asyncio.to_thread(_is_chroma_available):
+            raise ConnectionError("Chroma server is not reachable.")
+        return await asyncio.to_thread(warm_chroma_clients, graph.get("rag_tools", []))
+
+    async def build_agent():
+        app.state.mcp_tools = [tool for name in mcp_steps for tool in graph.get(name, [])]
+        app.state.agent_executor = create_mcp_agent_executor(app.state.llm_instance, app.state.mcp_tools + app.state.rag_tools)
         if app.state.agent_executor is None:
-            print("❌ Agent Executor was not created.")
-    else:
+            raise RuntimeError("Agent Executor was not created.")
+
+    async def swap_server_tools(server_name, tools):
+        # A background schema refresh finished; wait for the first agent build before swapping
+        await graph.steps["agent"].done.wait()
+        others = [tool for tool in app.state.mcp_tools if (tool.metadata or {}).get("mcp_server") != server_name]
+        swap_agent_tools(app.state, mcp_tools=others + tools)
+
+    mcp_steps = []
+    if app.state.mcp_pool is not None:
+        await app.state.mcp_pool.start()
+        for server_name in app.state.mcp_pool.connections:
+            mcp_steps.append(f"mcp:{server_name}")
+            graph.add(
+                mcp_steps[-1],
+                functools.partial(load_server_tools, app.state.mcp_pool, server_name, swap_server_tools, persist=leader),
+                timeout=config.STARTUP_MCP_TIMEOUT,
+            )
+
+    graph.add("db_schema", create_schema, timeout=config.STARTUP_DB_TIMEOUT, critical=True)
+    graph.add("llm", init_llm, critical=True)
+    graph.add("rag_tools", init_rag_tools, requires=["llm"])
+    graph.add("agent", build_agent, requires=["llm"], after=mcp_steps + ["rag_tools"], critical=True)
+    if leader:
+        # Batches commit independently, so a backfill cut short by the timeout resumes on the next start
+        graph.add("chat_backfill", backfill_chat_columns, requires=["db_schema"], timeout=3600, background=True)
+    graph.add("tokenizer_warmup", warm_tokenizer, timeout=config.STARTUP_WARMUP_TIMEOUT, background=True)
+    graph.add("embedding_warmup", warm_embeddings, timeout=config.STARTUP_WARMUP_TIMEOUT, background=True)
+    graph.add("chroma", warm_chroma, after=["rag_tools", "embedding_warmup"], timeout=config.STARTUP_WARMUP_TIMEOUT, background=True)
+    await graph.run()
+
+    if app.state.agent_executor is None:
         print("❌ Agent not initialized due to LLM initialization failure.")
+
+    async def reload_rag_tools(job):
+        # Pick up new or re-indexed sources without restarting the process
+        swap_agent_tools(app.state, rag_tools=await setup_rag_tools(app.state.llm_instance))
+        print(f"✅ RAG tools reloaded after indexing '{job.resource_name}'.")
+
+    app.state.index_runner = IndexJobRunner(on_complete=reload_rag_tools) if leader else None
+    archiver = asyncio.create_task(run_archiver()) if leader else None
     yield
+    if archiver is not None:
+        # Let an archive run that is mid-transaction unwind before the engine goes away
+        archiver.cancel()
+        try:
+            await archiver
+        except asyncio.CancelledError:
+            pass
+    await graph.cancel_background()
+    await cancel_refreshes()
+    if app.state.index_runner is not None:
+        await app.state.index_runner.stop()
+    await close_embedding_batcher()
+    if app.state.mcp_pool is not None:
+        await app.state.mcp_pool.close()
+    await asyncio.to_thread(close_trace_writer)
 
 app = FastAPI(
     title="Persistent LangChain MCP Agent API",
@@ -58,9 +159,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Last-Write-At"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=config.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=config.COMPRESSION_BROTLI_QUALITY,
 )
 
 app.include_router(api_router, prefix="/api/v1")
+# Served at the root where Prometheus scrapers look by default
+app.include_router(metrics_endpoint.router, tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime, ForeignKey # type: ignore
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, LargeBinary # type: ignore
 from sqlalchemy.sql import func # type: ignore
 from db.base import Base
 
@@ -10,6 +10,12 @@ class ChatSession(Base):
     title = Column(String, index=True, default="New Chat")
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
+    # Denormalized from chat_messages in the same transaction as each insert, for the session list
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_preview = Column(String, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    # NULL on rows that predate the columns above until backfill_session_stats recomputes them
+    stats_backfilled = Column(Integer, nullable=True, default=1)
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -20,4 +26,37 @@ class ChatMessage(Base):
     is_summary = Column(Integer, default=0)  # 1 if summary message, else 0
     tool_used = Column(String, nullable=True)  # Name of the tool used, if any
     content = Column(JSON) # Store message content as JSON
+    plain_text = Column(Text, nullable=True) # Text the model sees, derived from content at write time
+    token_count = Column(Integer, nullable=True) # Tokens in plain_text, for SQL-side history windowing
+    token_estimator = Column(String, nullable=True) # Counter behind token_count: 'cl100k_base' or 'chars/4' (NULL: not recorded)
+    created_at = Column(DateTime, server_default=func.now())
+
+class ChatMessageArchive(Base):
+    """Cold tier: all archived messages of one session as a single compressed JSON block."""
+    __tablename__ = "chat_message_archives"
+
+    chat_session_id = Column(String, ForeignKey("chat_sessions.id"), primary_key=True)
+    codec = Column(String, nullable=False)  # 'zstd' or 'zlib'
+    message_count = Column(Integer, nullable=False)
+    raw_size = Column(Integer, nullable=False)  # Uncompressed bytes, for reporting the ratio
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class CodeBlob(Base):
+    """ReactBlock code stored once by content hash; message content keeps only the hash."""
+    __tablename__ = "code_blobs"
+
+    hash = Column(String, primary_key=True)  # sha256 hex digest of the code
+    code = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+class IdempotencyKey(Base):
+    """Outcome of a POST /sessions/chat sent with an Idempotency-Key header, replayed for retries."""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)  # sha256 of the request body; a reused key must match it
+    response = Column(JSON, nullable=True)  # NULL while the first request is still running
     created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field # type: ignore
+from typing import Optional, List, Literal
+from datetime import datetime
+
+class IndexJobStatus(BaseModel):
+    """Pydantic model describing a background ingestion job for one source."""
+    id: str
+    resource_name: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"] = "queued"
+    batches_committed: int = Field(0, description="Number of chunk batches embedded and upserted so far.")
+    chunks_processed: int = Field(0, description="Number of chunks in committed batches.")
+    return_code: Optional[int] = Field(None, description="Exit code of populate_source (0 success, 1 Chroma unreachable, 2 no documents).")
+    error: Optional[str] = None
+    queued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class IndexJobList(BaseModel):
+    """Pydantic model for listing ingestion jobs."""
+    jobs: List[IndexJobStatus]
@@ -48,6 +48,9 @@ class MessageRequest(BaseModel):
     session_id: str = Field(..., description="The ID of the chat session to which the message belongs.")
     user_id: int = Field(..., description="The ID of the user sending the message.")
     content: str = Field(..., description="The content of the new message.")
+    max_iterations: Optional[int] = Field(None, ge=1, description="Optional cap on agent iterations for this message.")
+    max_seconds: Optional[float] = Field(None, gt=0, description="Optional wall-clock cap in seconds for this message.")
+    max_tokens: Optional[int] = Field(None, ge=1, description="Optional cap on total LLM tokens for this message.")
     
 class ChatSessionResponse(BaseModel):
     """Pydantic model for a chat session response."""
@@ -56,17 +59,34 @@ class ChatSessionResponse(BaseModel):
     title: str
     created_at: datetime
     updated_at: Optional[datetime] = None
+    message_count: int = Field(0, description="Number of messages in the session.")
+    last_message_preview: Optional[str] = Field(None, description="Start of the most recent message's text.")
+    last_message_at: Optional[datetime] = Field(None, description="When the most recent message was written.")
     messages: List[ChatMessageResponse] = Field(..., description="List of messages in the session.")
 
     class Config:
         from_attributes = True
 
+class AgentBudgetUsage(BaseModel):
+    """Pydantic model reporting an agent turn's budget limits and consumption."""
+    iterations: int
+    max_iterations: int
+    elapsed_seconds: float
+    max_seconds: float
+    total_tokens: int
+    max_tokens: int
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+    stopped_reason: Optional[Literal["iterations", "time", "tokens"]] = Field(None, description="Which budget ended the run early, if any.")
+
 class MessageResponse(BaseModel):
     """Pydantic model for the response after sending a message."""
     session_id: str
     user_message: ChatMessageResponse
     ai_response: ChatMessageResponse
     tool_names_used: List[str] = Field(default=[], description="List of tools utilized by the agent.")
+    budget: Optional[AgentBudgetUsage] = Field(None, description="Budget limits applied to the turn and how much of them was used.")
 
 class SessionListResponse(BaseModel):
     """Pydantic model for listing multiple chat sessions."""
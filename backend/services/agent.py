@@ -1,58 +1,254 @@
 from typing import List, Any, Optional, Tuple
+from contextlib import aclosing
+import asyncio
+import time
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
-from schemas.chat import LLMOutputBlock
-import logging
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langchain_core.messages import HumanMessage, BaseMessage, SystemMessage
+from core import config
+from schemas.chat import LLMOutputBlock, TextBlock, AgentBudgetUsage
+from services.tool_runtime import with_tool_limits, start_tool_step_limits
+from services.tool_memo import with_result_cache
+from services.tool_router import ToolRouter
+from services.usage import UsageCallback
+from services.tracing import TracingCallback, span
+from services.singleflight import SingleFlight, make_key
+
+# Static prompt text lives in module constants so every call sends a byte-identical prefix
+AGENT_SYSTEM_PROMPT = "You are an AI assistant. Maintain conversation context using the provided chat history."
+
+STRUCTURER_SYSTEM_PROMPT = "You are an AI assistant. " \
+    "Your responses should be structured as an array of content blocks, which can be either plain text or React components. " \
+    "When presenting data analysis, statistics, or any information that can be visually represented, automatically generate a React component to render a suitable chart or graph (e.g., histogram, bar chart, line chart). " \
+    "For React components, ensure the `code` field of the `ReactBlock` contains a string representing a default export of a React functional component. For example: \'\'\'export default function MyComponent() { return <div>Hello</div>; }\'\'\'. " \
+    "Always provide some introductory and concluding text around any React components to make the conversation flow naturally. " \
+    "Also, it should be compatible with this theme :root {font-family: system-ui, Avenir, Helvetica, Arial, sans-serif; line-height: 1.5; font-weight: 400; color-scheme: light dark; color: rgba(255, 255, 255, 0.87); background-color: #242424; font-synthesis: none; }"
+
+def _uses_cache_control(llm_instance: Any) -> bool:
+    """Whether the provider needs explicit cache breakpoints; OpenAI-style providers cache prefixes automatically."""
+    if config.PROMPT_CACHE_CONTROL in ("on", "off"):
+        return config.PROMPT_CACHE_CONTROL == "on"
+    model_name = getattr(llm_instance, "model_name", "") or ""
+    return model_name.startswith(("anthropic/", "google/gemini"))
+
+def _static_system_message(text: str, llm_instance: Any) -> SystemMessage:
+    """Builds the system message that ends the static prefix, with a cache breakpoint where supported."""
+    if _uses_cache_control(llm_instance):
+        return SystemMessage(content=[{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}])
+    return SystemMessage(content=text)
+
+def _routing_query(inputs: dict) -> str:
+    """The turn's input plus the previous user message, so a follow-up keeps the tools of the question it refers to."""
+    previous = next((m.content for m in reversed(inputs.get("chat_history") or []) if m.type == "human"), None)
+    if not isinstance(previous, str) or not previous:
+        return inputs["input"]
+    return f"{previous}\n{inputs['input']}"
+
+def _create_routed_tools_agent(llm_instance: ChatOpenAI, tools_list: List[Any], prompt: ChatPromptTemplate) -> Runnable:
+    """Builds the OpenAI-tools agent, binding only the tools the router picks for the turn's input.
+
+    Equivalent to create_openai_tools_agent, except that the tool schemas sent to the model are
+    chosen per query instead of bound once for every tool.
+    """
+    tools_list = sorted(tools_list, key=lambda t: t.name)
+    router = ToolRouter(tools_list)
+    bound: dict = {}
+
+    def _bind(tools: List[Any]) -> Runnable:
+        # Reuse the bound model per tool set so identical selections serialize identical schemas
+        key = tuple(t.name for t in tools)
+        if key not in bound:
+            bound[key] = llm_instance.bind_tools(tools)
+        return bound[key]
+
+    def _messages(inputs: dict):
+        return prompt.invoke({**inputs, "agent_scratchpad": format_to_openai_tool_messages(inputs["intermediate_steps"])})
+
+    def plan(inputs: dict, config: RunnableConfig):
+        return _bind(tools_list).invoke(_messages(inputs), config)
+
+    async def aplan(inputs: dict, config: RunnableConfig):
+        selected = await router.select(_routing_query(inputs))
+        return await _bind(selected).ainvoke(_messages(inputs), config)
+
+    return RunnableLambda(plan, afunc=aplan) | OpenAIToolsAgentOutputParser()
 
 def create_mcp_agent_executor(llm_instance: ChatOpenAI, tools_list: List[Any]) -> Optional[AgentExecutor]:
     """Creates and returns an agent executor."""
     if not llm_instance:
         return None
         
+    # System prompt and tool schemas form the stable prefix; history only ever grows after it
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", "You are an AI assistant. Maintain conversation context using the provided chat history."),
+            _static_system_message(AGENT_SYSTEM_PROMPT, llm_instance),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ]
     )
 
-    agent = create_openai_tools_agent(llm=llm_instance, tools=tools_list, prompt=prompt)
-    executor = AgentExecutor(agent=agent, tools=tools_list, verbose=True)
+    # Tool calls from one step already run through asyncio.gather; this adds the cap and deadlines
+    tools_list = with_tool_limits(with_result_cache(tools_list))
+    agent = _create_routed_tools_agent(llm_instance, tools_list, prompt)
+    # Backstop only: per-request budgets are enforced in get_agent_response
+    executor = AgentExecutor(
+        agent=agent,
+        tools=tools_list,
+        verbose=True,
+        max_iterations=config.AGENT_MAX_ITERATIONS,
+        max_execution_time=config.AGENT_MAX_SECONDS,
+    )
     executor = executor.with_config({"run_name": "Jarvis"})
     print("✅ Agent Executor created successfully.")
     return executor
 
-async def get_agent_response(agent_executor: AgentExecutor, user_input: str, chat_history: List[BaseMessage], llm_instance: ChatOpenAI) -> Tuple[LLMOutputBlock, List[str]]:
-    """Gets a response from the agent and returns the text and tools used."""
+def swap_agent_tools(state: Any, mcp_tools: Optional[List[Any]] = None, rag_tools: Optional[List[Any]] = None) -> None:
+    """Rebuilds the agent executor with an updated tool list and swaps it into the app state.
+
+    Requests already running keep the executor they started with; new requests pick up the new one.
+    """
+    if mcp_tools is not None:
+        state.mcp_tools = mcp_tools
+    if rag_tools is not None:
+        state.rag_tools = rag_tools
+    llm_instance = getattr(state, "llm_instance", None)
+    if not llm_instance:
+        return
+    executor = create_mcp_agent_executor(llm_instance, state.mcp_tools + state.rag_tools)
+    if executor is not None:
+        state.agent_executor = executor
+
+class AgentBudget:
+    """Per-turn limits on agent iterations, wall-clock time and total LLM tokens."""
+
+    def __init__(self, max_iterations: Optional[int] = None, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None):
+        # Requests can tighten the server limits but not raise them
+        self.max_iterations = min(max_iterations or config.AGENT_MAX_ITERATIONS, config.AGENT_MAX_ITERATIONS)
+        self.max_seconds = min(max_seconds or config.AGENT_MAX_SECONDS, config.AGENT_MAX_SECONDS)
+        self.max_tokens = min(max_tokens or config.AGENT_MAX_TOKENS, config.AGENT_MAX_TOKENS)
+
+# Shortest excerpt worth showing per tool result; below this, older results are dropped instead
+PARTIAL_ANSWER_MIN_CHARS = 200
+
+def _partial_answer(observations: List[Tuple[str, str]], stopped_reason: str, max_tokens: int) -> str:
+    """Builds the best answer available from the (tool, result) pairs gathered before a budget ran out.
+
+    The results share AGENT_PARTIAL_ANSWER_SHARE of the turn's token budget (~4 characters per
+    token): each becomes a one-line excerpt under its tool name, and the oldest are left out when
+    even the shortest excerpts would not fit.
+    """
+    header = f"I stopped early because this request reached its {stopped_reason.rstrip('s')} budget."
+    if not observations:
+        return header + " No tool results were gathered yet; please try a narrower question."
+    total_chars = max(PARTIAL_ANSWER_MIN_CHARS, int(max_tokens * config.AGENT_PARTIAL_ANSWER_SHARE) * 4)
+    per_result = max(PARTIAL_ANSWER_MIN_CHARS, total_chars // len(observations))
+    kept = observations[-max(1, total_chars // per_result):]
+    lines = []
+    for tool, observation in kept:
+        excerpt = " ".join(observation.split())
+        if len(excerpt) > per_result:
+            excerpt = excerpt[:per_result].rstrip() + " …"
+        lines.append(f"- {tool}: {excerpt}")
+    summary = f" Here is what I found so far from {len(observations)} tool call(s):\n\n" + "\n".join(lines)
+    if len(kept) < len(observations):
+        summary += f"\n\n({len(observations) - len(kept)} earlier tool result(s) left out for length.)"
+    return header + summary
+
+_agent_calls = SingleFlight("agent")
+
+async def get_agent_response(agent_executor: AgentExecutor, user_input: str, chat_history: List[BaseMessage], llm_instance: ChatOpenAI,
+                             budget: Optional[AgentBudget] = None, user_id: Optional[int] = None) -> Tuple[LLMOutputBlock, List[str], AgentBudgetUsage]:
+    """Gets a response from the agent within the budget and returns the text, tools used and budget usage.
+
+    Identical turns of the same user already in flight (same executor, input, history and budget,
+    e.g. a double submit) share one agent run; different users never share a run or its budget.
+    """
+    budget = budget or AgentBudget()
+    key = make_key(
+        user_id, id(agent_executor), id(llm_instance), user_input,
+        [(m.type, m.content) for m in chat_history],
+        budget.max_iterations, budget.max_seconds, budget.max_tokens,
+    )
+    return await _agent_calls.do(key, lambda: _run_agent(agent_executor, user_input, chat_history, llm_instance, budget))
+
+async def _run_agent(agent_executor: AgentExecutor, user_input: str, chat_history: List[BaseMessage], llm_instance: ChatOpenAI,
+                     budget: AgentBudget) -> Tuple[LLMOutputBlock, List[str], AgentBudgetUsage]:
     agent_input = {"input": user_input, "chat_history": chat_history}
     response_parts = ""
     tool_names_used = []
+    observations: List[Tuple[str, str]] = []
+    plans = set()
+    stopped_reason = None
+    usage = UsageCallback()
+    started = time.monotonic()
+    start_tool_step_limits()
     try:
-        async for chunk in agent_executor.astream(agent_input):
-            if "actions" in chunk:
-                for action in chunk["actions"]:
-                    tool_names_used.append(action.tool)
-            
-            if "output" in chunk:
-                response_parts += chunk["output"]
+        with span("agent", history_messages=len(chat_history)):
+            tracer = TracingCallback()
+            async with asyncio.timeout(budget.max_seconds):
+                async with aclosing(agent_executor.astream(agent_input, config={"callbacks": [usage, tracer]})) as stream:
+                    async for chunk in stream:
+                        if "actions" in chunk:
+                            for action in chunk["actions"]:
+                                tool_names_used.append(action.tool)
+                                # Actions planned by the same model call share its message log
+                                plans.add(id(action.message_log[-1]) if getattr(action, "message_log", None) else id(action))
 
+                        if "steps" in chunk:
+                            observations.extend((step.action.tool, str(step.observation)) for step in chunk["steps"])
+                            # Check between iterations, once every tool call planned so far has returned
+                            if len(observations) < len(tool_names_used):
+                                continue
+                            if len(plans) >= budget.max_iterations:
+                                stopped_reason = "iterations"
+                            elif usage.total_tokens >= budget.max_tokens:
+                                stopped_reason = "tokens"
+                            if stopped_reason:
+                                break
+
+                        if "output" in chunk:
+                            response_parts += chunk["output"]
+                            plans.add("output")
+
+    except TimeoutError:
+        stopped_reason = "time"
     except Exception as e:
         print(f"💥 Agent Execution Error: {e}")
         response_parts = f"I apologize, the AI agent encountered an error. {e}"
-    
-    structured_llm = llm_instance.with_structured_output(LLMOutputBlock)
-    pro = "You are an AI assistant. " \
-    "Your responses should be structured as an array of content blocks, which can be either plain text or React components. " \
-    "When presenting data analysis, statistics, or any information that can be visually represented, automatically generate a React component to render a suitable chart or graph (e.g., histogram, bar chart, line chart). " \
-    "For React components, ensure the `code` field of the `ReactBlock` contains a string representing a default export of a React functional component. For example: '''export default function MyComponent() { return <div>Hello</div>; }'''. " \
-    "Always provide some introductory and concluding text around any React components to make the conversation flow naturally. " \
-    "Also, it should be compatible with this theme :root {font-family: system-ui, Avenir, Helvetica, Arial, sans-serif; line-height: 1.5; font-weight: 400; color-scheme: light dark; color: rgba(255, 255, 255, 0.87); background-color: #242424; font-synthesis: none; }"
-    
-    structured_response = await structured_llm.ainvoke(pro + response_parts)
+
+    if stopped_reason:
+        print(f"⚠️ Agent stopped early: {stopped_reason} budget reached after {len(plans)} iterations.")
+        response_parts = _partial_answer(observations, stopped_reason, budget.max_tokens)
+
+    if stopped_reason == "time":
+        # No time left for the structuring call, so return the partial answer as plain text
+        structured_response = LLMOutputBlock(blocks=[TextBlock(text=response_parts)])
+    else:
+        structured_llm = llm_instance.with_structured_output(LLMOutputBlock)
+        with span("structure"):
+            # The instructions go in their own system message so only the agent output varies between calls
+            structured_response = await structured_llm.ainvoke(
+                [_static_system_message(STRUCTURER_SYSTEM_PROMPT, llm_instance), HumanMessage(content=response_parts)],
+                config={"callbacks": [usage, TracingCallback()]},
+            )
+    print(f"📊 Turn usage: {usage.llm_calls} LLM calls, {usage.input_tokens} input tokens ({usage.cached_input_tokens} cached), {usage.output_tokens} output tokens.")
     unique_tool_names = list(set(tool_names_used))
 
-    return structured_response, unique_tool_names
\ No newline at end of file
+    budget_usage = AgentBudgetUsage(
+        iterations=len(plans),
+        max_iterations=budget.max_iterations,
+        elapsed_seconds=round(time.monotonic() - started, 3),
+        max_seconds=budget.max_seconds,
+        total_tokens=usage.total_tokens,
+        max_tokens=budget.max_tokens,
+        input_tokens=usage.input_tokens,
+        cached_input_tokens=usage.cached_input_tokens,
+        output_tokens=usage.output_tokens,
+        stopped_reason=stopped_reason,
+    )
+    return structured_response, unique_tool_names, budget_usage
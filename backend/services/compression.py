@@ -0,0 +1,29 @@
+from typing import Tuple
+import zlib
+from core import config
+
+try:
+    import zstandard # type: ignore
+except ImportError:
+    zstandard = None
+
+def _codec() -> str:
+    if config.ARCHIVE_CODEC == "zstd" and zstandard is None:
+        return "zlib"
+    return config.ARCHIVE_CODEC
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """Compresses with ARCHIVE_CODEC, falling back to zlib when zstandard is not installed; returns (codec, blob)."""
+    codec = _codec()
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=config.ARCHIVE_COMPRESSION_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, min(config.ARCHIVE_COMPRESSION_LEVEL, 9))
+
+def decompress(codec: str, blob: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive block is zstd-compressed; install zstandard to read it.")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    raise ValueError(f"Unknown archive codec '{codec}'.")
@@ -0,0 +1,111 @@
+from typing import List, Optional, Tuple
+import asyncio
+import time
+from langchain_core.embeddings import Embeddings # type: ignore
+from core import config
+from services import metrics
+from services.embeddings import get_embedding_function
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+queue_depth = metrics.gauge("embedding_queue_depth", "Query embeddings waiting for the next batch.")
+batch_size_histogram = metrics.histogram("embedding_batch_size", "Number of queries embedded per batch.", BATCH_SIZE_BUCKETS)
+batch_seconds = metrics.histogram("embedding_batch_seconds", "Wall time spent embedding one batch.")
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embed_query calls over a short window and embeds them as one batch."""
+
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def embed_query(self, text: str) -> List[float]:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        queue_depth.set(self._queue.qsize())
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued before waiting on the window
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            queue_depth.set(self._queue.qsize())
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            # Identical queries in the same window share one row of the batch
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            batch_size_histogram.observe(len(unique_texts))
+            started = time.perf_counter()
+            try:
+                vectors = await asyncio.to_thread(self.embeddings.embed_documents, unique_texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                batch_seconds.observe(time.perf_counter() - started)
+
+            by_text = dict(zip(unique_texts, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+
+_batcher: Optional[EmbeddingBatcher] = None
+_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Returns the process-wide batcher, recreating it if the running event loop changed."""
+    global _batcher, _batcher_loop
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        _batcher = EmbeddingBatcher(
+            get_embedding_function(),
+            max_batch_size=config.EMBEDDING_MAX_BATCH,
+            max_wait_ms=config.EMBEDDING_BATCH_WINDOW_MS,
+        )
+        _batcher_loop = loop
+    return _batcher
+
+
+async def close_embedding_batcher() -> None:
+    global _batcher
+    if _batcher is not None:
+        await _batcher.close()
+        _batcher = None
@@ -0,0 +1,218 @@
+from typing import List, Optional, Dict, Any
+from functools import lru_cache
+import argparse
+import os
+import sys
+import threading
+import numpy as np # type: ignore
+from langchain_core.embeddings import Embeddings # type: ignore
+from core import config
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256  # Matches the sentence-transformers config for all-MiniLM-L6-v2
+
+
+class OnnxEmbeddings(Embeddings):
+    """Runs an exported MiniLM through ONNX Runtime with mean pooling, matching sentence-transformers output."""
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        cache_dir: str = config.EMBEDDING_CACHE_DIR,
+        batch_size: int = config.EMBEDDING_BATCH_SIZE,
+        intra_op_threads: int = config.EMBEDDING_THREADS,
+        quantize: bool = config.EMBEDDING_QUANTIZE,
+    ):
+        import onnxruntime as ort # type: ignore
+        from tokenizers import Tokenizer # type: ignore
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        model_path = _ensure_onnx_model(model_name, model_dir)
+        if quantize:
+            model_path = _ensure_quantized_model(model_path)
+
+        self.tokenizer = Tokenizer.from_pretrained(model_name)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        print(f"✅ ONNX embedding model loaded from {model_path}.")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        # Pad only to the longest text in this batch rather than to MAX_SEQ_LENGTH
+        encodings = self.tokenizer.encode_batch(texts)
+        max_len = max(len(e.ids) for e in encodings)
+        input_ids = np.zeros((len(texts), max_len), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), max_len), dtype=np.int64)
+        for i, e in enumerate(encodings):
+            input_ids[i, :len(e.ids)] = e.ids
+            attention_mask[i, :len(e.attention_mask)] = e.attention_mask
+        feeds: Dict[str, Any] = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Group texts of similar length so each batch carries as little padding as possible
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            batch = self._encode_batch([texts[i] for i in idx])
+            for row, i in zip(batch, idx):
+                vectors[i] = row.tolist()
+        return vectors # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+def _ensure_onnx_model(model_name: str, model_dir: str) -> str:
+    """Returns the path to an ONNX export of the model, exporting it on first use."""
+    model_path = os.path.join(model_dir, "model.onnx")
+    if os.path.exists(model_path):
+        return model_path
+    os.makedirs(model_dir, exist_ok=True)
+    try:
+        from huggingface_hub import hf_hub_download # type: ignore
+        # local_dir puts a plain file under model_dir (cache_dir would use the hub's snapshot layout,
+        # which the exists() check above never finds); it is moved to model_path so later starts stay offline
+        downloaded = hf_hub_download(model_name, "onnx/model.onnx", local_dir=model_dir)
+        os.replace(downloaded, model_path)
+        return model_path
+    except Exception as e:
+        print(f"⚠️ No published ONNX export for {model_name} ({e}), exporting locally.")
+
+    import torch # type: ignore
+    from transformers import AutoModel, AutoTokenizer # type: ignore
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    tmp_path = model_path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    os.replace(tmp_path, model_path)
+    return model_path
+
+
+def _ensure_quantized_model(model_path: str) -> str:
+    """Returns the path to an int8 dynamically quantized copy of the model, written next to it in model_dir."""
+    quantized_path = os.path.splitext(model_path)[0] + ".int8.onnx"
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType # type: ignore
+        tmp_path = quantized_path + ".tmp"
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+    return quantized_path
+
+
+def _get_torch_embeddings() -> Embeddings:
+    from langchain_huggingface import HuggingFaceEmbeddings # type: ignore
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': config.EMBEDDING_BATCH_SIZE}
+    )
+
+
+_load_lock = threading.Lock()
+
+
+def get_embedding_function(backend: Optional[str] = None) -> Embeddings:
+    """Returns the process-wide embedding model for the configured backend."""
+    # Startup warmup and the first requests may race to load the model from different threads
+    with _load_lock:
+        return _load_embedding_function((backend or config.EMBEDDING_BACKEND).lower())
+
+
+@lru_cache(maxsize=None)
+def _load_embedding_function(backend: str) -> Embeddings:
+    if backend == "onnx":
+        return OnnxEmbeddings()
+    if backend != "torch":
+        print(f"⚠️ Unknown EMBEDDING_BACKEND '{backend}', falling back to torch.")
+    if config.EMBEDDING_THREADS > 0:
+        import torch # type: ignore
+        torch.set_num_threads(config.EMBEDDING_THREADS)
+    return _get_torch_embeddings()
+
+
+def prepare_model(backend: Optional[str] = None) -> None:
+    """Loads what can be shared copy-on-write with forked workers, without starting inference threads.
+
+    The torch model is loaded as-is. An ONNX Runtime session owns a thread pool that does not survive
+    fork, so for onnx only the exported (and quantized) model files are prepared; each worker opens
+    its own session.
+    """
+    backend = (backend or config.EMBEDDING_BACKEND).lower()
+    if backend != "onnx":
+        get_embedding_function(backend)
+        return
+    model_dir = os.path.join(config.EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_NAME.replace("/", "__"))
+    model_path = _ensure_onnx_model(EMBEDDING_MODEL_NAME, model_dir)
+    if config.EMBEDDING_QUANTIZE:
+        _ensure_quantized_model(model_path)
+
+
+PARITY_TEXTS = [
+    "How many houses must be built before a hotel can be purchased?",
+    "A Pod is the smallest deployable unit of computing that you can create and manage in Kubernetes.",
+    "Dependency injection in FastAPI is declared with Depends.",
+    "Spring Boot Actuator exposes health and metrics endpoints.",
+    "short",
+]
+
+
+def check_parity(texts: List[str] = PARITY_TEXTS, min_cosine: float = 0.99, onnx: Optional[Embeddings] = None) -> float:
+    """Compares ONNX vectors (the configured model unless onnx is given) to the PyTorch reference and returns the lowest cosine similarity."""
+    reference = np.array(get_embedding_function("torch").embed_documents(texts))
+    candidate = np.array((onnx or get_embedding_function("onnx")).embed_documents(texts))
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    worst = float(cosines.min())
+    status = "✅" if worst >= min_cosine else "❌"
+    print(f"{status} ONNX/torch parity: min cosine {worst:.5f} (threshold {min_cosine}) over {len(texts)} texts.")
+    return worst
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Embedding backend utilities.")
+    parser.add_argument("--parity", action="store_true", help="Check ONNX output against the PyTorch reference.")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args(argv)
+    if args.parity:
+        return 0 if check_parity(min_cosine=args.min_cosine) >= args.min_cosine else 1
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+from typing import Dict, List, Optional, Callable, Awaitable, Any
+from datetime import datetime, timezone
+from uuid import uuid4
+import asyncio
+import threading
+import time
+from core import config
+from schemas.admin import IndexJobStatus
+
+
+class IndexJobCancelled(Exception):
+    pass
+
+
+class IndexJobRunner:
+    """Runs populate_source jobs one at a time in a background thread inside the API process.
+
+    CPU use is throttled with a duty cycle: after each committed batch the worker sleeps so that
+    embedding takes at most INGEST_CPU_SHARE of wall time, leaving headroom for request handling.
+    """
+
+    def __init__(
+        self,
+        on_complete: Optional[Callable[[IndexJobStatus], Awaitable[None]]] = None,
+        batch_size: int = config.INGEST_BATCH_SIZE,
+        cpu_share: float = config.INGEST_CPU_SHARE,
+    ):
+        self.on_complete = on_complete
+        self.batch_size = batch_size
+        self.cpu_share = min(max(cpu_share, 0.05), 1.0)
+        self.jobs: Dict[str, IndexJobStatus] = {}
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._stop.clear()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def submit(self, resource_name: str) -> IndexJobStatus:
+        """Queues a job for the source, or returns the one already queued or running for it."""
+        for job in self.jobs.values():
+            if job.resource_name == resource_name and job.status in ("queued", "running"):
+                return job
+        job = IndexJobStatus(id=str(uuid4()), resource_name=resource_name, queued_at=datetime.now(timezone.utc))
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        self.start()
+        return job
+
+    def list_jobs(self) -> List[IndexJobStatus]:
+        return sorted(self.jobs.values(), key=lambda j: j.queued_at, reverse=True)
+
+    def get_job(self, job_id: str) -> Optional[IndexJobStatus]:
+        return self.jobs.get(job_id)
+
+    def _make_batch_callback(self, job: IndexJobStatus) -> Callable[[List[Any]], None]:
+        last_mark = time.monotonic()
+
+        def on_batch(batch: List[Any]) -> None:
+            nonlocal last_mark
+            job.batches_committed += 1
+            job.chunks_processed += len(batch)
+            busy = time.monotonic() - last_mark
+            idle = busy * (1.0 - self.cpu_share) / self.cpu_share
+            # Event.wait doubles as an interruptible sleep so shutdown does not wait out the throttle
+            if self._stop.wait(idle):
+                raise IndexJobCancelled()
+            last_mark = time.monotonic()
+
+        return on_batch
+
+    def _populate(self, job: IndexJobStatus) -> int:
+        # Imported lazily so the API process only loads the document loaders when a job runs
+        from data import populate_vectors
+        return populate_vectors.populate_source(
+            job.resource_name, batch_size=self.batch_size, on_batch=self._make_batch_callback(job)
+        )
+
+    async def _run(self) -> None:
+        while True:
+            job = self.jobs[await self._queue.get()]
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            try:
+                job.return_code = await asyncio.to_thread(self._populate, job)
+                job.status = "succeeded" if job.return_code == 0 else "failed"
+            except IndexJobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                print(f"❌ Ingestion job for '{job.resource_name}' failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+
+            if job.status == "succeeded" and self.on_complete:
+                try:
+                    await self.on_complete(job)
+                except Exception as e:
+                    print(f"❌ Post-ingestion hook failed for '{job.resource_name}': {e}")
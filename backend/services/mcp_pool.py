@@ -0,0 +1,202 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+import asyncio
+import random
+import anyio # type: ignore
+from langchain_core.tools import StructuredTool, ToolException # type: ignore
+from langchain_mcp_adapters.client import MultiServerMCPClient # type: ignore
+from mcp import ClientSession # type: ignore
+from mcp.types import Tool as MCPTool, TextContent # type: ignore
+from core import config
+
+
+class _ServerConnection:
+    """Owns one long-lived MCP session and reconnects it with exponential backoff.
+
+    The session is opened and closed inside a single background task because the MCP transports
+    are anyio task groups that must be exited by the task that entered them.
+    """
+
+    def __init__(self, name: str, client: MultiServerMCPClient):
+        self.name = name
+        self.client = client
+        self.session: Optional[ClientSession] = None
+        self.state = "disconnected"  # disconnected | connecting | up | down
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[datetime] = None
+        self.last_ok_at: Optional[datetime] = None
+        self._ready = asyncio.Event()
+        self._reconnect = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.state = "disconnected"
+
+    async def _run(self) -> None:
+        backoff = config.MCP_RECONNECT_INITIAL_SECONDS
+        while True:
+            self.state = "connecting"
+            try:
+                async with self.client.session(self.name) as session:
+                    self.session = session
+                    self.state = "up"
+                    self.consecutive_failures = 0
+                    self.connected_at = self.last_ok_at = datetime.now(timezone.utc)
+                    backoff = config.MCP_RECONNECT_INITIAL_SECONDS
+                    self._ready.set()
+                    print(f"✅ MCP session to '{self.name}' established.")
+                    await self._keepalive(session)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.consecutive_failures += 1
+                self.last_error = str(e) or e.__class__.__name__
+                print(f"❌ MCP session to '{self.name}' failed ({self.consecutive_failures}x): {self.last_error}")
+            finally:
+                self._ready.clear()
+                self.session = None
+
+            self.state = "down"
+            # Full jitter keeps several workers from reconnecting in lockstep
+            await asyncio.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, config.MCP_RECONNECT_MAX_SECONDS)
+
+    async def _keepalive(self, session: ClientSession) -> None:
+        """Pings the server periodically; returns when a reconnect is requested, raises when a ping fails."""
+        while True:
+            try:
+                await asyncio.wait_for(self._reconnect.wait(), config.MCP_KEEPALIVE_SECONDS)
+                self._reconnect.clear()
+                return
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.wait_for(session.send_ping(), config.MCP_CALL_TIMEOUT)
+            self.last_ok_at = datetime.now(timezone.utc)
+
+    async def get_session(self, timeout: float) -> ClientSession:
+        self.start()
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"MCP server '{self.name}' is not reachable ({self.last_error or self.state}).")
+        return self.session # type: ignore[return-value]
+
+    def request_reconnect(self) -> None:
+        # Stop handing out the current session until the owner task has replaced it
+        self._ready.clear()
+        self._reconnect.set()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "connected_at": self.connected_at.isoformat() if self.connected_at else None,
+            "last_ok_at": self.last_ok_at.isoformat() if self.last_ok_at else None,
+        }
+
+
+# Raised by the session's write stream when it is already closed, i.e. before the request is sent
+_NOT_SENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+def _format_call_result(result: Any) -> str:
+    texts = [c.text for c in result.content if isinstance(c, TextContent)]
+    text = "\n".join(texts) if texts else str(result.content)
+    if result.isError:
+        raise ToolException(text)
+    return text
+
+
+class MCPSessionPool:
+    """Keeps one warm session per configured MCP server and routes tool calls through it."""
+
+    def __init__(self, servers: Dict[str, Dict[str, Any]]):
+        self.client = MultiServerMCPClient(servers)
+        self.connections = {name: _ServerConnection(name, self.client) for name in servers}
+
+    async def start(self) -> None:
+        for connection in self.connections.values():
+            connection.start()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.close() for c in self.connections.values()))
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        return {name: c.health() for name, c in self.connections.items()}
+
+    async def list_tools(self, server_name: str, timeout: float = config.MCP_CONNECT_TIMEOUT) -> List[MCPTool]:
+        connection = self.connections[server_name]
+        session = await connection.get_session(timeout)
+        result = await asyncio.wait_for(session.list_tools(), config.MCP_CALL_TIMEOUT)
+        return list(result.tools)
+
+    async def call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any], idempotent: bool = False) -> str:
+        """Calls a tool on the warm session, reconnecting and retrying once if the session has dropped.
+
+        A call that fails after the request may have reached the server is only retried for
+        idempotent tools, so mutating tools never apply their side effect twice.
+        """
+        connection = self.connections[server_name]
+        for attempt in range(2):
+            session = await connection.get_session(config.MCP_CONNECT_TIMEOUT)
+            try:
+                result = await asyncio.wait_for(session.call_tool(tool_name, arguments), config.MCP_CALL_TIMEOUT)
+                connection.last_ok_at = datetime.now(timezone.utc)
+                return _format_call_result(result)
+            except (ToolException, asyncio.TimeoutError):
+                raise
+            except Exception as e:
+                connection.last_error = str(e)
+                connection.request_reconnect()
+                if attempt == 1 or not (idempotent or isinstance(e, _NOT_SENT_ERRORS)):
+                    raise
+                print(f"⚠️ MCP call '{tool_name}' on '{server_name}' failed ({e}); reconnecting.")
+        raise ConnectionError(f"MCP server '{server_name}' is not reachable.")
+
+    def make_tool(self, server_name: str, tool: MCPTool) -> StructuredTool:
+        """Wraps an MCP tool definition as a LangChain tool that calls through this pool."""
+        annotations = tool.annotations
+        idempotent = annotations is not None and bool(annotations.readOnlyHint or annotations.idempotentHint)
+
+        async def call(**arguments: Any) -> str:
+            return await self.call_tool(server_name, tool.name, arguments, idempotent=idempotent)
+
+        metadata = tool.annotations.model_dump() if tool.annotations is not None else {}
+        metadata["mcp_server"] = server_name
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call,
+            metadata=metadata,
+            handle_tool_error=True,
+        )
+
+    async def get_server_tools(self, server_name: str) -> List[StructuredTool]:
+        return [self.make_tool(server_name, tool) for tool in await self.list_tools(server_name)]
+
+    async def get_tools(self) -> List[StructuredTool]:
+        """Discovers the tools of every server concurrently; unreachable servers contribute none."""
+        names = list(self.connections)
+        results = await asyncio.gather(*(self.get_server_tools(name) for name in names), return_exceptions=True)
+        tools: List[StructuredTool] = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"❌ Error listing tools from MCP server '{name}': {result}")
+                continue
+            tools.extend(result)
+        return tools
@@ -0,0 +1,150 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from langchain_core.tools import StructuredTool # type: ignore
+from mcp.types import Tool as MCPTool # type: ignore
+from core import config
+from services.mcp_pool import MCPSessionPool
+
+CACHE_VERSION = 1
+
+
+def _server_fingerprint(server_name: str) -> str:
+    # Cached schemas are only reused for the same server URL; headers are deliberately left out
+    url = config.MCP_SERVERS.get(server_name, {}).get("url", "")
+    return hashlib.sha256(f"{server_name}|{url}".encode()).hexdigest()[:16]
+
+
+def _tools_etag(tools: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(tools, sort_keys=True).encode()).hexdigest()
+
+
+class MCPToolSchemaCache:
+    """Stores the tool definitions discovered from each MCP server in a local JSON file.
+
+    Each server entry records the definitions, an ETag over them and a fingerprint of the server
+    configuration, so a changed URL invalidates the entry.
+    """
+
+    def __init__(self, path: str = config.MCP_TOOL_CACHE_PATH):
+        self.path = path
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return data.get("servers", {}) if data.get("version") == CACHE_VERSION else {}
+
+    def load(self, server_name: str) -> Optional[Dict[str, Any]]:
+        entry = self._read().get(server_name)
+        if not entry or entry.get("fingerprint") != _server_fingerprint(server_name):
+            return None
+        try:
+            entry["tools"] = [MCPTool.model_validate(t) for t in entry.get("tools", [])]
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable MCP tool cache for '{server_name}': {e}")
+            return None
+        return entry
+
+    def save(self, server_name: str, tools: List[MCPTool]) -> str:
+        """Writes the server's definitions and returns their ETag."""
+        serialized = [t.model_dump(mode="json", exclude_none=True) for t in tools]
+        etag = _tools_etag(serialized)
+        servers = self._read()
+        servers[server_name] = {
+            "fingerprint": _server_fingerprint(server_name),
+            "etag": etag,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "tools": serialized,
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # A temp file of its own, so concurrent writers never truncate or move each other's
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": CACHE_VERSION, "servers": servers}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return etag
+
+
+_refresh_tasks: Set[asyncio.Task] = set()
+# Entries parsed in a preforking master (services.prefork) and inherited by every worker
+_preloaded: Dict[str, Dict[str, Any]] = {}
+
+
+async def cancel_refreshes() -> None:
+    """Cancels background schema refreshes that are still running, for shutdown."""
+    tasks = list(_refresh_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def preload_schemas(cache: Optional[MCPToolSchemaCache] = None) -> int:
+    """Parses the cached definitions of every configured server up front; returns how many tools were loaded."""
+    cache = cache or MCPToolSchemaCache()
+    for server_name in config.MCP_SERVERS:
+        entry = cache.load(server_name)
+        if entry is not None:
+            _preloaded[server_name] = entry
+    return sum(len(entry["tools"]) for entry in _preloaded.values())
+
+
+async def _refresh_server_tools(
+    pool: MCPSessionPool,
+    cache: MCPToolSchemaCache,
+    server_name: str,
+    cached_etag: Optional[str],
+    on_refresh: Callable[[str, List[StructuredTool]], Awaitable[None]],
+    persist: bool,
+) -> None:
+    try:
+        tools = await pool.list_tools(server_name)
+    except Exception as e:
+        print(f"⚠️ Background refresh of MCP tools from '{server_name}' failed; keeping cached tools: {e}")
+        return
+    serialized = [t.model_dump(mode="json", exclude_none=True) for t in tools]
+    etag = cache.save(server_name, tools) if persist else _tools_etag(serialized)
+    if etag == cached_etag:
+        return
+    print(f"✅ MCP tools from '{server_name}' changed; swapping in {len(tools)} refreshed tools.")
+    await on_refresh(server_name, [pool.make_tool(server_name, t) for t in tools])
+
+
+async def load_server_tools(
+    pool: MCPSessionPool,
+    server_name: str,
+    on_refresh: Callable[[str, List[StructuredTool]], Awaitable[None]],
+    cache: Optional[MCPToolSchemaCache] = None,
+    persist: bool = True,
+) -> List[StructuredTool]:
+    """Returns the server's tools from the cache right away and refreshes them in the background.
+
+    Without a cache entry this falls back to live discovery and seeds the cache. on_refresh is only
+    called when the refreshed definitions differ from the cached ones. With persist=False (workers
+    other than the prefork leader) the refreshed tools are used but the cache file is left alone.
+    """
+    entry = _preloaded.get(server_name) if cache is None else None
+    cache = cache or MCPToolSchemaCache()
+    entry = entry or cache.load(server_name)
+    if entry is None:
+        tools = await pool.list_tools(server_name)
+        if persist:
+            cache.save(server_name, tools)
+        return [pool.make_tool(server_name, t) for t in tools]
+
+    task = asyncio.create_task(_refresh_server_tools(pool, cache, server_name, entry["etag"], on_refresh, persist))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+    print(f"✅ Loaded {len(entry['tools'])} cached MCP tools for '{server_name}' (fetched {entry['fetched_at']}).")
+    return [pool.make_tool(server_name, t) for t in entry["tools"]]
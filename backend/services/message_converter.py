@@ -1,28 +1,72 @@
-from typing import List
+from typing import Any, Iterable, List, Optional
+from functools import lru_cache
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
 from models.chat import ChatMessage
 
+def content_to_plain_text(content: Any) -> str:
+    """Flattens stored message content (structured blocks or legacy text) to the text the model sees."""
+    # Handle both old string content and new LLMOutputBlock content
+    if isinstance(content, dict) and "blocks" in content:
+        # New structured content
+        content_blocks = content["blocks"]
+        return " ".join([block["text"] for block in content_blocks if block["block_type"] == "text"])
+    elif isinstance(content, dict) and "text" in content:
+        # Old unstructured content
+        return content["text"]
+    # Fallback for unexpected content formats
+    return str(content)
+
+# Names recorded in ChatMessage.token_estimator for the counter that produced token_count
+TIKTOKEN_ESTIMATOR = "cl100k_base"
+LENGTH_ESTIMATOR = "chars/4"
+
+@lru_cache(maxsize=1)
+def _get_encoding() -> Optional[Any]:
+    try:
+        import tiktoken # type: ignore
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"⚠️ tiktoken encoding unavailable ({e}); estimating token counts from text length.")
+        return None
+
+def token_estimator() -> str:
+    """Which counter count_tokens uses in this process."""
+    return TIKTOKEN_ESTIMATOR if _get_encoding() is not None else LENGTH_ESTIMATOR
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with the cl100k encoding, or estimates ~4 characters per token without it."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _to_lc_message(role: str, content_text: str) -> Optional[BaseMessage]:
+    if role.lower() == "user":
+        return HumanMessage(content=content_text)
+    elif role.lower() == "ai":
+        return AIMessage(content=content_text)
+    return None
+
 def db_messages_to_lc_messages(history_records: List[ChatMessage]) -> List[BaseMessage]:
     """Converts a list of ChatMessage DB objects to LangChain's BaseMessage list."""
     lc_messages = []
     for rec in history_records:
         if not rec.content:
             continue
-            
-        # Handle both old string content and new LLMOutputBlock content
-        if isinstance(rec.content, dict) and "blocks" in rec.content:
-            # New structured content
-            content_blocks = rec.content["blocks"]
-            content_text = " ".join([block["text"] for block in content_blocks if block["block_type"] == "text"])
-        elif isinstance(rec.content, dict) and "text" in rec.content:
-            # Old unstructured content
-            content_text = rec.content["text"]
-        else:
-            # Fallback for unexpected content formats
-            content_text = str(rec.content)
-
-        if rec.role.lower() == "user":
-            lc_messages.append(HumanMessage(content=content_text))
-        elif rec.role.lower() == "ai":
-            lc_messages.append(AIMessage(content=content_text))
+        content_text = rec.plain_text if rec.plain_text is not None else content_to_plain_text(rec.content)
+        message = _to_lc_message(rec.role, content_text)
+        if message is not None:
+            lc_messages.append(message)
+    return lc_messages
+
+def history_rows_to_lc_messages(rows: Iterable[Any]) -> List[BaseMessage]:
+    """Converts narrow (role, plain_text, content) history rows; content is only set for rows not yet backfilled."""
+    lc_messages = []
+    for row in rows:
+        content_text = row.plain_text if row.plain_text is not None else (content_to_plain_text(row.content) if row.content else None)
+        if content_text is None:
+            continue
+        message = _to_lc_message(row.role, content_text)
+        if message is not None:
+            lc_messages.append(message)
     return lc_messages
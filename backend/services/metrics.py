@@ -0,0 +1,134 @@
+from typing import Dict, List, Any, Sequence, Union
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Gauge:
+    """A value that can go up and down, such as a queue depth."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"type": "gauge", "description": self.description, "value": self._value}
+
+
+class Counter:
+    """A value that only goes up, such as a count of cache hits; exported with a _total name."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented.")
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"type": "counter", "description": self.description, "value": self._value}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "type": "histogram",
+                "description": self.description,
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, self._counts)},
+                "count": self._count,
+                "sum": self._sum,
+            }
+
+
+_registry: Dict[str, Union[Gauge, Counter, Histogram]] = {}
+_registry_lock = threading.Lock()
+
+
+def gauge(name: str, description: str) -> Gauge:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Gauge(name, description)
+        return _registry[name] # type: ignore[return-value]
+
+
+def counter(name: str, description: str) -> Counter:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, description)
+        return _registry[name] # type: ignore[return-value]
+
+
+def histogram(name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, description, buckets)
+        return _registry[name] # type: ignore[return-value]
+
+
+def snapshot(prefix: str = "") -> Dict[str, Dict[str, Any]]:
+    """Returns the current value of every registered metric whose name starts with prefix."""
+    with _registry_lock:
+        metrics: List[Union[Gauge, Counter, Histogram]] = [m for name, m in _registry.items() if name.startswith(prefix)]
+    return {m.name: m.snapshot() for m in metrics}
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(prefix: str = "") -> str:
+    """Renders the registry in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for name, data in sorted(snapshot(prefix).items()):
+        lines.append(f"# HELP {name} {data['description']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        if data["type"] in ("gauge", "counter"):
+            lines.append(f"{name} {_format_value(data['value'])}")
+            continue
+        for bound, count in data["buckets"].items():
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {data["count"]}')
+        lines.append(f"{name}_sum {_format_value(data['sum'])}")
+        lines.append(f"{name}_count {data['count']}")
+    return "\n".join(lines) + "\n"
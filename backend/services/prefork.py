@@ -0,0 +1,98 @@
+"""Support for running under a preforking server (gunicorn with preload_app, see gunicorn.conf.py).
+
+The master imports the app, loads the heavy read-only state (embedding model, cached MCP tool
+schemas, tokenizer) and freezes the GC so those objects stay in shared copy-on-write pages. Each
+forked worker then resets the state that must not be shared with its parent and runs the normal
+lifespan, which picks the preloaded objects up instead of loading them again.
+
+Every worker runs the lifespan, so jobs that must run once per host (archiver, chat backfill,
+indexer, MCP schema cache writes) are started only by the worker that takes the leader lock. The
+database schema is migrated once in the master before forking.
+
+With the file-backed SQLite mode, the single writer connection is per worker: WEB_CONCURRENCY > 1
+means several writers again, serialized by SQLite's busy_timeout (sized by the worker count) rather
+than by the pool.
+"""
+from typing import IO, Optional
+import asyncio
+import gc
+import os
+import threading
+import time
+from core import config
+from services import embedding_batcher, embeddings, metrics, rag, tool_memo, tracing
+from services.mcp_schema_cache import preload_schemas
+from services.message_converter import count_tokens
+
+_registered = False
+_leader_lock: Optional[IO] = None
+
+
+def acquire_leader_lock(path: str = config.LEADER_LOCK_PATH) -> bool:
+    """Returns True in the one process on this host that should run singleton jobs.
+
+    The lock is held until the process exits, so the worker that replaces a dead leader takes over.
+    """
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): a single process is the only supported setup there
+        return True
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lock_file = open(path, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_lock = lock_file
+    return True
+
+
+async def _migrate_schema() -> None:
+    from db.base import Base
+    from db.migrations import add_missing_columns
+    from db.session import engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    await engine.dispose()
+
+
+def _reset_after_fork() -> None:
+    from db import session
+    # Pooled connections belong to the parent; close=False leaves its sockets alone
+    for engine in {session.engine, session.read_engine}:
+        engine.sync_engine.dispose(close=False)
+    embedding_batcher._batcher = None
+    embedding_batcher._batcher_loop = None
+    rag._get_chroma_client.cache_clear()
+    # A lock held by another thread at fork time would never be released in the child
+    embeddings._load_lock = threading.Lock()
+    # The master's trace writer thread does not exist in the child; the first export starts a new one
+    tracing._writer = None
+    tracing._writer_lock = threading.Lock()
+    metrics._registry_lock = threading.Lock()
+    tool_memo.result_cache._lock = threading.Lock()
+
+
+def preload() -> None:
+    """Loads shared state in the master process and prepares workers to re-create the rest after fork."""
+    global _registered
+    started = time.perf_counter()
+    # Once here instead of concurrently in every worker, where the ALTER TABLEs would race
+    asyncio.run(_migrate_schema())
+    embeddings.prepare_model()
+    tools = preload_schemas()
+    count_tokens("warmup")
+    if not _registered:
+        os.register_at_fork(after_in_child=_reset_after_fork)
+        _registered = True
+    # Objects that exist now are never collected, so the GC never writes to (and un-shares) their pages
+    gc.collect()
+    gc.freeze()
+    print(f"✅ Preloaded embedding model and {tools} cached MCP tools in {time.perf_counter() - started:.1f}s "
+          f"({gc.get_freeze_count()} objects frozen before fork).")
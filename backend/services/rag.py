@@ -1,21 +1,17 @@
 from typing import Dict, Any, Optional, List, Tuple
+import asyncio
 import socket
+from functools import lru_cache
 from langchain_chroma import Chroma # type: ignore
-from langchain_huggingface import HuggingFaceEmbeddings # type: ignore
 from langchain.prompts import ChatPromptTemplate # type: ignore
 from langchain_core.language_models import BaseChatModel # type: ignore
 from core import config
+from services.embeddings import get_embedding_function
+from services.embedding_batcher import get_embedding_batcher
+from services.singleflight import SingleFlight
 
-EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-
-def get_embedding_function():
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
-    return embeddings
 
+VECTOR_DB_UNAVAILABLE = "Vector database is not available."
 
 PROMPT_TEMPLATE = """
 Answer the question based only on the following context:
@@ -28,6 +24,8 @@ Answer the question based on the above context: {question}
 """
 
 
+# Handles are cached per collection; a failed connection raises and is not cached
+@lru_cache(maxsize=None)
 def _get_chroma_client(collection_name: Optional[str] = None) -> Chroma:
     # If a collection name is provided, use it to namespace documents
     kwargs: Dict[str, Any] = {
@@ -39,6 +37,12 @@ def _get_chroma_client(collection_name: Optional[str] = None) -> Chroma:
         kwargs["collection_name"] = collection_name
     return Chroma(**kwargs) # type: ignore[arg-type]
 
+def warm_chroma_clients(collection_names: List[str]) -> int:
+    """Opens the Chroma handle for each collection ahead of the first query."""
+    for name in collection_names:
+        _get_chroma_client(collection_name=name)
+    return len(collection_names)
+
 def _is_chroma_available() -> bool:
     host = config.CHROMA_HOST
     port = int(config.CHROMA_PORT) if isinstance(config.CHROMA_PORT, str) else config.CHROMA_PORT
@@ -49,20 +53,48 @@ def _is_chroma_available() -> bool:
     except Exception:
         return False
 
+def _build_rag_prompt(query: str, results: List[Tuple[Any, float]]) -> str:
+    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
+    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    return prompt_template.format(context=context_text, question=query)
+
 def query_vector_database(query: str, llm: BaseChatModel, k: int = 4, namespace: Optional[str] = None):
     if not _is_chroma_available():
-        return "Vector database is not available.", []
+        return VECTOR_DB_UNAVAILABLE, []
 
     # If a specific namespace/collection is provided, only search there
     db = _get_chroma_client(collection_name=namespace) if namespace else _get_chroma_client()
     results = db.similarity_search_with_score(query, k=k)
 
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-    prompt = prompt_template.format(context=context_text, question=query)
-
+    prompt = _build_rag_prompt(query, results)
     response_text = llm.invoke(prompt)
 
     sources = [doc.metadata.get("id", None) for doc, _score in results]
     return response_text.content, sources
 
+_rag_calls = SingleFlight("RAG query")
+
+async def aquery_vector_database(query: str, llm: BaseChatModel, k: int = 4, namespace: Optional[str] = None):
+    """Async variant that embeds the query through the shared micro-batcher.
+
+    Concurrent identical queries against the same collection and LLM share one search and answer.
+    """
+    return await _rag_calls.do((query, k, namespace, id(llm)), lambda: _aquery_vector_database(query, llm, k, namespace))
+
+async def _aquery_vector_database(query: str, llm: BaseChatModel, k: int, namespace: Optional[str]):
+    if not await asyncio.to_thread(_is_chroma_available):
+        return VECTOR_DB_UNAVAILABLE, []
+
+    # The first call per namespace opens the HTTP client and collection, so keep it off the event loop
+    if namespace:
+        db = await asyncio.to_thread(_get_chroma_client, collection_name=namespace)
+    else:
+        db = await asyncio.to_thread(_get_chroma_client)
+    embedding = await get_embedding_batcher().embed_query(query)
+    results = await asyncio.to_thread(db.similarity_search_by_vector_with_relevance_scores, embedding, k)
+
+    prompt = _build_rag_prompt(query, results)
+    response_text = await llm.ainvoke(prompt)
+
+    sources = [doc.metadata.get("id", None) for doc, _score in results]
+    return response_text.content, sources
@@ -0,0 +1,53 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import hashlib
+import json
+from services import metrics
+
+coalesced_calls = metrics.counter("singleflight_coalesced_total", "Calls served by an identical call that was already in flight.")
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight task.
+
+    Every caller awaits the same result (or exception). The task keeps running while at least one
+    caller is waiting and is cancelled when the last one goes away. Finished calls are not cached.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None or call.task.get_loop() is not asyncio.get_running_loop():
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+        else:
+            coalesced_calls.inc()
+            print(f"📊 Coalesced a duplicate in-flight {self.name} call.")
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody wants the result any more; later callers start a fresh call
+                call.task.cancel()
+                self._forget(key, call)
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+def make_key(*parts: Any) -> str:
+    """Stable digest of JSON-serializable parts, for keys built from large inputs."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
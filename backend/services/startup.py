@@ -0,0 +1,95 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from datetime import datetime, timezone
+import asyncio
+import time
+
+
+class _Step:
+    def __init__(self, name: str, fn: Callable[[], Awaitable[Any]], requires: Iterable[str], after: Iterable[str],
+                 timeout: float, critical: bool, background: bool):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+        self.timeout = timeout
+        self.critical = critical
+        self.background = background
+        self.status = "pending"  # pending | running | ready | failed | timeout | skipped
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.duration_ms: Optional[float] = None
+        self.done = asyncio.Event()
+
+
+class StartupGraph:
+    """Runs named startup steps concurrently, each once its dependencies finish, with its own timeout.
+
+    `requires` dependencies must succeed or the step is skipped; `after` dependencies only have to
+    finish. Background steps keep running after run() returns and are reported by readiness().
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, _Step] = {}
+        self.results: Dict[str, Any] = {}
+        self._background: List[asyncio.Task] = []
+
+    def add(self, name: str, fn: Callable[[], Awaitable[Any]], requires: Iterable[str] = (), after: Iterable[str] = (),
+            timeout: float = 30.0, critical: bool = False, background: bool = False) -> None:
+        self.steps[name] = _Step(name, fn, requires, after, timeout, critical, background)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+    async def _run_step(self, step: _Step) -> None:
+        try:
+            for dep in step.requires + step.after:
+                await self.steps[dep].done.wait()
+            failed = [dep for dep in step.requires if self.steps[dep].status != "ready"]
+            if failed:
+                step.status = "skipped"
+                step.error = f"dependency not ready: {', '.join(failed)}"
+                return
+
+            step.status = "running"
+            step.started_at = datetime.now(timezone.utc)
+            started = time.perf_counter()
+            try:
+                self.results[step.name] = await asyncio.wait_for(step.fn(), step.timeout)
+                step.status = "ready"
+            except asyncio.TimeoutError:
+                step.status = "timeout"
+                step.error = f"did not finish within {step.timeout}s"
+            except Exception as e:
+                step.status = "failed"
+                step.error = str(e) or e.__class__.__name__
+            step.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            icon = "✅" if step.status == "ready" else "❌"
+            print(f"{icon} Startup step '{step.name}' {step.status} in {step.duration_ms}ms{': ' + step.error if step.error else ''}")
+        finally:
+            step.done.set()
+
+    async def run(self) -> None:
+        """Starts every step and waits for the foreground ones."""
+        foreground = []
+        for step in self.steps.values():
+            task = asyncio.create_task(self._run_step(step))
+            (self._background if step.background else foreground).append(task)
+        await asyncio.gather(*foreground)
+
+    async def cancel_background(self) -> None:
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    def readiness(self) -> Dict[str, Any]:
+        components = {
+            name: {
+                "status": step.status,
+                "critical": step.critical,
+                "error": step.error,
+                "duration_ms": step.duration_ms,
+            }
+            for name, step in self.steps.items()
+        }
+        ready = all(step.status == "ready" for step in self.steps.values() if step.critical)
+        return {"ready": ready, "components": components}
@@ -0,0 +1,119 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from fnmatch import fnmatch
+import json
+import threading
+import time
+from langchain_core.tools import BaseTool, StructuredTool # type: ignore
+from core import config
+from services import metrics
+
+cache_hits = metrics.counter("tool_cache_hits_total", "Tool calls answered from the result cache.")
+cache_misses = metrics.counter("tool_cache_misses_total", "Cacheable tool calls that had to run the tool.")
+
+
+def _normalize(value: Any) -> Any:
+    # Strings stay byte-exact: whitespace can be significant to a tool (code search, exact phrases)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def make_cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """Builds a key that ignores argument order and None-valued arguments; values are compared exactly."""
+    return tool_name + ":" + json.dumps(_normalize(arguments), sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    """Size-bounded LRU cache of tool results with a TTL per entry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared across executor rebuilds so hot-swapped agents keep their warm cache
+result_cache = ToolResultCache(config.TOOL_CACHE_MAX_ENTRIES)
+
+
+def get_cache_ttl(tool_name: str, allowlist: Dict[str, float] = config.TOOL_CACHE_TTLS) -> Optional[float]:
+    """Returns the TTL for an allow-listed (read-only) tool, or None if its results must not be cached."""
+    for pattern, ttl in allowlist.items():
+        if fnmatch(tool_name, pattern):
+            return float(ttl)
+    return None
+
+
+def memoize_tool(tool: BaseTool, ttl: float, cache: ToolResultCache = result_cache) -> StructuredTool:
+    """Wraps a read-only tool so identical calls within the TTL reuse the previous result.
+
+    Failed calls are never cached: the inner tool raises instead of turning errors into text.
+    """
+    inner = tool.model_copy(update={"handle_tool_error": False})
+
+    async def call(**kwargs: Any) -> Any:
+        key = make_cache_key(tool.name, kwargs)
+        hit, value = cache.get(key)
+        if hit:
+            cache_hits.inc()
+            return value
+        cache_misses.inc()
+        value = await inner.ainvoke(kwargs)
+        cache.set(key, value, ttl)
+        return value
+
+    def run(**kwargs: Any) -> Any:
+        key = make_cache_key(tool.name, kwargs)
+        hit, value = cache.get(key)
+        if hit:
+            cache_hits.inc()
+            return value
+        cache_misses.inc()
+        value = inner.invoke(kwargs)
+        cache.set(key, value, ttl)
+        return value
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=run,
+        coroutine=call,
+        metadata=tool.metadata,
+        handle_tool_error=True,
+    )
+
+
+def with_result_cache(tools: List[BaseTool]) -> List[BaseTool]:
+    """Memoizes the allow-listed tools and passes every other tool through untouched."""
+    wrapped: List[BaseTool] = []
+    for tool in tools:
+        ttl = get_cache_ttl(tool.name)
+        wrapped.append(memoize_tool(tool, ttl) if ttl else tool)
+    return wrapped
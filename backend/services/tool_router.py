@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional, Sequence
+from collections import OrderedDict
+from fnmatch import fnmatch
+import asyncio
+import numpy as np # type: ignore
+from langchain_core.tools import BaseTool # type: ignore
+from core import config
+from services.embeddings import get_embedding_function
+from services.embedding_batcher import get_embedding_batcher
+
+
+class ToolRouter:
+    """Picks the tools most relevant to a query by cosine similarity to their names and descriptions.
+
+    Tool vectors are computed once per tool list with the shared MiniLM model; queries go through
+    the embedding micro-batcher. Selections are remembered per query because the agent asks again
+    on every step of the same turn.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], top_n: int = config.TOOL_ROUTER_TOP_N,
+                 always_include: Sequence[str] = config.TOOL_ROUTER_ALWAYS_INCLUDE, max_cached_queries: int = 256):
+        self.tools = list(tools)
+        self.top_n = top_n
+        self.always_include = [t for t in self.tools if any(fnmatch(t.name, p) for p in always_include)]
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+        self._selections: "OrderedDict[str, List[BaseTool]]" = OrderedDict()
+        self._max_cached_queries = max_cached_queries
+
+    @property
+    def enabled(self) -> bool:
+        return 0 < self.top_n < len(self.tools)
+
+    async def _ensure_index(self) -> np.ndarray:
+        async with self._lock:
+            if self._matrix is None:
+                texts = [f"{t.name}: {t.description}" for t in self.tools]
+                vectors = await asyncio.to_thread(get_embedding_function().embed_documents, texts)
+                self._matrix = np.asarray(vectors, dtype=np.float32)
+        return self._matrix
+
+    async def select(self, query: str) -> List[BaseTool]:
+        """Returns the always-included tools followed by the top-N for the query, each group in name order.
+
+        Falls back to every tool when the query cannot be embedded.
+        """
+        if not self.enabled:
+            return self.tools
+        cached = self._selections.get(query)
+        if cached is not None:
+            self._selections.move_to_end(query)
+            return cached
+
+        try:
+            matrix = await self._ensure_index()
+            query_vector = np.asarray(await get_embedding_batcher().embed_query(query), dtype=np.float32)
+        except Exception as e:
+            # Routing only trims the prompt; without the embedding model the turn still runs with every tool
+            print(f"⚠️ Tool routing failed ({e}); binding all {len(self.tools)} tools.")
+            return self.tools
+        # Vectors are L2-normalized, so the dot product is the cosine similarity
+        scores = matrix @ query_vector
+        top = np.argsort(-scores)[:self.top_n]
+        pinned: Dict[str, BaseTool] = {t.name: t for t in self.always_include}
+        routed: Dict[str, BaseTool] = {}
+        for i in top:
+            if self.tools[i].name not in pinned:
+                routed.setdefault(self.tools[i].name, self.tools[i])
+        # Always-included tools come first so every turn shares their schemas as a cached prefix; sorting
+        # both groups by name keeps the bound schemas byte-identical for repeated selections
+        selection = [pinned[name] for name in sorted(pinned)] + [routed[name] for name in sorted(routed)]
+
+        self._selections[query] = selection
+        while len(self._selections) > self._max_cached_queries:
+            self._selections.popitem(last=False)
+        return selection
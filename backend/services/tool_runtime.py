@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Optional
+from contextlib import nullcontext
+from contextvars import ContextVar
+from fnmatch import fnmatch
+import asyncio
+from langchain_core.tools import BaseTool, StructuredTool # type: ignore
+from core import config
+
+# Set per agent run; the AgentExecutor gathers one step's tool calls in tasks that inherit it
+_step_semaphore: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("tool_step_semaphore", default=None)
+
+
+def start_tool_step_limits(max_parallel: int = config.MAX_PARALLEL_TOOL_CALLS) -> None:
+    """Caps how many tool calls from one agent step run at once for the current run."""
+    _step_semaphore.set(asyncio.Semaphore(max(1, max_parallel)))
+
+
+def get_tool_timeout(tool_name: str, overrides: Dict[str, float] = config.TOOL_TIMEOUTS) -> float:
+    for pattern, timeout in overrides.items():
+        if fnmatch(tool_name, pattern):
+            return float(timeout)
+    return config.TOOL_TIMEOUT_SECONDS
+
+
+def limit_tool(tool: BaseTool, timeout: float) -> StructuredTool:
+    """Wraps a tool so concurrent calls share the step's concurrency cap and each call has a deadline.
+
+    A timed-out call returns a message to the model instead of failing the whole step.
+    """
+    async def call(**kwargs: Any) -> Any:
+        semaphore = _step_semaphore.get()
+        async with semaphore or nullcontext():
+            try:
+                return await asyncio.wait_for(tool.ainvoke(kwargs), timeout)
+            except asyncio.TimeoutError:
+                return f"Tool '{tool.name}' timed out after {timeout:g}s."
+
+    def run(**kwargs: Any) -> Any:
+        return tool.invoke(kwargs)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=run,
+        coroutine=call,
+        metadata=tool.metadata,
+        handle_tool_error=True,
+    )
+
+
+def with_tool_limits(tools: List[BaseTool]) -> List[BaseTool]:
+    return [limit_tool(tool, get_tool_timeout(tool.name)) for tool in tools]
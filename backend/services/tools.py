@@ -1,27 +1,63 @@
-from typing import List, Any
-from langchain_mcp_adapters.client import MultiServerMCPClient # type: ignore
-from langchain.tools import Tool # type: ignore
+from typing import List, Any, Optional
+from langchain.tools import StructuredTool # type: ignore
+from langchain_core.tools import ToolException # type: ignore
+from pydantic import BaseModel, Field # type: ignore
 from core import config
-from services.rag import query_vector_database
+from services.mcp_pool import MCPSessionPool
+from services.rag import query_vector_database, aquery_vector_database, VECTOR_DB_UNAVAILABLE
 import json
 import os
 import aiofiles # type: ignore
 
-async def setup_tools(llm: Any) -> List[Any]:
-    """Sets up and returns a list of tools, including MCP-based ones and RAG tool."""
-    mcp_tools = []
+class RAGQueryInput(BaseModel):
+    query: str = Field(..., description="The question to look up in the knowledge base.")
+
+def _make_rag_tool(resource_name: str, description: str, llm: Any) -> StructuredTool:
+    """Builds a RAG tool bound to one Chroma collection, with an async path for the agent."""
+    # Raising (rather than returning the message) keeps outages out of the tool result cache
+    def run(query: str) -> str:
+        answer = query_vector_database(query, llm, namespace=resource_name)[0]
+        if answer == VECTOR_DB_UNAVAILABLE:
+            raise ToolException(answer)
+        return answer
+
+    async def arun(query: str) -> str:
+        answer = (await aquery_vector_database(query, llm, namespace=resource_name))[0]
+        if answer == VECTOR_DB_UNAVAILABLE:
+            raise ToolException(answer)
+        return answer
+
+    return StructuredTool.from_function(
+        func=run,
+        coroutine=arun,
+        name=f"RAG_{resource_name}",
+        description=f"RAG over '{resource_name}'. {description}",
+        args_schema=RAGQueryInput,
+        handle_tool_error=True,
+    )
+
+def create_mcp_pool() -> Optional[MCPSessionPool]:
+    """Creates the MCP session pool, or returns None when the servers' credentials are missing."""
+    if not all(server.get('headers') and server['headers'].get('Authorization') for server in config.MCP_SERVERS.values()) or not config.MCP_SERVERS["github"]["headers"]["Authorization"]:
+        print("❌ WARNING: MCP Authorization headers missing or invalid. Skipping MCP tool setup.")
+        return None
+    return MCPSessionPool(config.MCP_SERVERS)
+
+async def setup_mcp_tools(pool: Optional[MCPSessionPool]) -> List[Any]:
+    """Fetches the tools exposed by the configured MCP servers through the session pool."""
+    mcp_tools: List[Any] = []
+    if pool is None:
+        return mcp_tools
     try:
-        if not all(server.get('headers') and server['headers'].get('Authorization') for server in config.MCP_SERVERS.values()) or not config.MCP_SERVERS["github"]["headers"]["Authorization"]:
-            print("❌ WARNING: MCP Authorization headers missing or invalid. Skipping MCP tool setup.")
-        else:
-            client = MultiServerMCPClient(config.MCP_SERVERS)
-            mcp_tools = await client.get_tools()
-            print(f"✅ MCP tools fetched successfully. Found {len(mcp_tools)} tools.")
+        await pool.start()
+        mcp_tools = await pool.get_tools()
+        print(f"✅ MCP tools fetched successfully. Found {len(mcp_tools)} tools.")
     except Exception as e:
-        auth_hint = " (check GITHUB_COPILOT_TOKEN and Bearer prefix)" if isinstance(e, Exception) else ""
-        print(f"❌ Error setting up MCP tools: {e}{auth_hint}")
+        print(f"❌ Error setting up MCP tools: {e} (check GITHUB_COPILOT_TOKEN and Bearer prefix)")
+    return mcp_tools
 
-    # Create one RAG tool per source (namespace) so the agent can pick the right one
+async def setup_rag_tools(llm: Any) -> List[Any]:
+    """Creates one RAG tool per source (namespace) in sources.json so the agent can pick the right one."""
     sources = []
     sources_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "sources.json")
     try:
@@ -39,11 +75,5 @@ async def setup_tools(llm: Any) -> List[Any]:
         description = src.get("resource_description", "")
         if not resource_name:
             continue
-        tool = Tool(
-            name=f"RAG_{resource_name}",
-            func=lambda query, rn=resource_name: query_vector_database(query, llm, namespace=rn)[0],
-            description=f"RAG over '{resource_name}'. {description}",
-        )
-        rag_tools.append(tool)
-
-    return mcp_tools + rag_tools
+        rag_tools.append(_make_rag_tool(resource_name, description, llm))
+    return rag_tools
@@ -0,0 +1,286 @@
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import UUID, uuid4
+import functools
+import json
+import os
+import queue
+import re
+import threading
+import time
+from langchain_core.callbacks import AsyncCallbackHandler # type: ignore
+from langchain_core.outputs import LLMResult # type: ignore
+from core import config
+from services import metrics
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    """One timed stage of a turn; times are wall-clock nanoseconds so they can be replayed into OpenTelemetry."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        self.end_ns = time.time_ns()
+        stage_histogram(self.name).observe(self.duration)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """The spans recorded for one request, exported together when the root span ends."""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = uuid4().hex
+        self.spans: List[Span] = []
+        self.root = self.start_span(name, None, attributes)
+
+    def start_span(self, name: str, parent: Optional[Span], attributes: Optional[Dict[str, Any]] = None) -> Span:
+        span = Span(name, self.trace_id, parent.span_id if parent else None, attributes)
+        self.spans.append(span)
+        return span
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def stage_histogram(stage: str) -> metrics.Histogram:
+    name = "turn_" + re.sub(r"[^a-zA-Z0-9_]", "_", stage) + "_seconds"
+    return metrics.histogram(name, f"Latency of the '{stage}' stage of a chat turn.", STAGE_BUCKETS)
+
+
+@contextmanager
+def trace_turn(name: str, **attributes: Any) -> Iterator[Span]:
+    """Starts a trace for one request and exports it when the block exits."""
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace.root
+    except BaseException as e:
+        trace.root.finish(e)
+        raise
+    else:
+        trace.root.finish()
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        export_trace(trace)
+
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Decorates an async endpoint so each request runs inside its own trace."""
+    def decorator(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with trace_turn(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Times a stage as a child of the current span; a no-op outside trace_turn."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(e)
+        raise
+    else:
+        current.finish()
+    finally:
+        _current_span.reset(token)
+
+
+class TracingCallback(AsyncCallbackHandler):
+    """Records each LLM and tool call of an agent run as a span under the span active when it was created."""
+
+    def __init__(self):
+        self.trace = _current_trace.get()
+        self.parent = _current_span.get()
+        self._runs: Dict[UUID, Span] = {}
+        self._nested: set = set()
+
+    def _start(self, run_id: UUID, name: str, **attributes: Any) -> None:
+        if self.trace is not None:
+            self._runs[run_id] = self.trace.start_span(name, self.parent, attributes)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        current = self._runs.pop(run_id, None)
+        if current is not None:
+            current.set(**attributes)
+            current.finish(error)
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                                  parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start(run_id, "llm", messages=sum(len(m) for m in messages))
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        usage: Dict[str, int] = {}
+        for generations in response.generations:
+            for generation in generations:
+                for key, value in (getattr(getattr(generation, "message", None), "usage_metadata", None) or {}).items():
+                    if isinstance(value, int):
+                        usage[key] = usage.get(key, 0) + value
+        self._end(run_id, **usage)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        # Only the outermost call of a wrapped tool gets a span
+        if parent_run_id in self._runs or parent_run_id in self._nested:
+            self._nested.add(run_id)
+            return
+        self._start(run_id, "tool", tool=serialized.get("name") or kwargs.get("name"))
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._nested.discard(run_id)
+        self._end(run_id)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._nested.discard(run_id)
+        self._end(run_id, error)
+
+
+class _TraceFileWriter:
+    """Appends trace lines to TRACE_FILE from a daemon thread, so requests never wait on disk I/O.
+
+    Lines queue up while the file is written; each wakeup writes everything queued in one open/append.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        self._queue.put(line)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Writes the lines queued so far and stops the thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            lines = [self._queue.get()]
+            while not self._queue.empty():
+                lines.append(self._queue.get_nowait())
+            stop = None in lines
+            try:
+                with open(self.path, "a") as f:
+                    f.write("".join(line + "\n" for line in lines if line is not None))
+            except OSError as e:
+                print(f"⚠️ Failed to write {len(lines)} trace(s) to {self.path}: {e}")
+            if stop:
+                return
+
+
+_writer: Optional[_TraceFileWriter] = None
+_writer_lock = threading.Lock()
+_otel_tracer: Any = None
+
+
+def _get_writer() -> _TraceFileWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _TraceFileWriter(config.TRACE_FILE)
+        return _writer
+
+
+def close_trace_writer() -> None:
+    """Flushes queued JSON traces to disk; called on shutdown."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+def _export_json(trace: Trace) -> None:
+    line = json.dumps({"trace_id": trace.trace_id, "spans": [s.to_dict() for s in trace.spans]}, default=str)
+    _get_writer().write(line)
+
+
+def _get_otel_tracer() -> Any:
+    global _otel_tracer
+    if _otel_tracer is None:
+        from opentelemetry import trace as otel_trace # type: ignore
+        _otel_tracer = otel_trace.get_tracer("jarvis.backend")
+    return _otel_tracer
+
+
+def _export_otel(trace: Trace) -> None:
+    # Spans are replayed after the fact with their recorded timestamps; the SDK/exporter is configured by the deployment
+    from opentelemetry import trace as otel_trace # type: ignore
+    tracer = _get_otel_tracer()
+    exported: Dict[str, Any] = {}
+    for s in trace.spans:
+        parent = exported.get(s.parent_id) if s.parent_id else None
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        attributes = {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in s.attributes.items()}
+        otel_span = tracer.start_span(s.name, context=context, start_time=s.start_ns, attributes=attributes)
+        if s.status == "error":
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        exported[s.span_id] = otel_span
+    for s in reversed(trace.spans):
+        exported[s.span_id].end(end_time=s.end_ns)
+
+
+def export_trace(trace: Trace) -> None:
+    """Writes the finished trace to the configured exporter (TRACE_EXPORTER=json|otel|none)."""
+    try:
+        if config.TRACE_EXPORTER == "json":
+            _export_json(trace)
+        elif config.TRACE_EXPORTER == "otel":
+            _export_otel(trace)
+    except ImportError:
+        print("⚠️ TRACE_EXPORTER=otel but opentelemetry is not installed; falling back to the JSON trace file.")
+        config.TRACE_EXPORTER = "json"
+        _export_json(trace)
+    except Exception as e:
+        print(f"⚠️ Failed to export trace {trace.trace_id}: {e}")
@@ -0,0 +1,47 @@
+from typing import Any, Dict
+from langchain_core.callbacks import AsyncCallbackHandler # type: ignore
+from langchain_core.outputs import LLMResult # type: ignore
+from services import metrics
+
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+prompt_tokens_histogram = metrics.histogram("llm_prompt_tokens", "Input tokens sent per LLM call.", TOKEN_BUCKETS)
+cached_tokens_histogram = metrics.histogram("llm_cached_prompt_tokens", "Input tokens served from the provider's prompt cache per LLM call.", TOKEN_BUCKETS)
+
+
+class UsageCallback(AsyncCallbackHandler):
+    """Accumulates token usage over every LLM call made during one turn."""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_input_tokens = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                input_tokens = usage.get("input_tokens", 0)
+                cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+                self.input_tokens += input_tokens
+                self.output_tokens += usage.get("output_tokens", 0)
+                self.cached_input_tokens += cached
+                prompt_tokens_histogram.observe(input_tokens)
+                cached_tokens_histogram.observe(cached)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+        }
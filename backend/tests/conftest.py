@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Tests import the app's modules the way main.py does, from the backend directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# The app reads these when core.config is first imported; keep test runs out of the real data/ directory
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///" + os.path.join(TEST_DATA_DIR, "chat.db"))
+os.environ.setdefault("LEADER_LOCK_PATH", os.path.join(TEST_DATA_DIR, "leader.lock"))
+os.environ.setdefault("TRACE_FILE", os.path.join(TEST_DATA_DIR, "traces.jsonl"))
+os.environ.setdefault("SQLALCHEMY_ECHO", "false")
@@ -0,0 +1,29 @@
+"""POST /admin/ingest queues work on the server, so it needs ADMIN_TOKEN and is off without one."""
+import pytest # type: ignore
+
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI # type: ignore # noqa: E402
+from fastapi.testclient import TestClient # type: ignore # noqa: E402
+from api.v1.endpoints import admin # noqa: E402
+from core import config # noqa: E402
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    return TestClient(app)
+
+
+def test_ingest_disabled_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", None)
+    assert client.post("/admin/ingest", headers={"Authorization": "Bearer anything"}).status_code == 403
+
+
+def test_ingest_requires_matching_token(client, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/admin/ingest").status_code == 401
+    assert client.post("/admin/ingest/docs", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    # Past the check, this app has no indexer running
+    assert client.post("/admin/ingest", headers={"Authorization": "Bearer s3cret"}).status_code == 503
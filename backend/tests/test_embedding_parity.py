@@ -0,0 +1,32 @@
+"""ONNX embeddings must match the sentence-transformers (PyTorch) reference closely enough to share a Chroma index.
+
+Skipped when onnxruntime or the PyTorch reference stack is not installed, or when the model cannot
+be downloaded or exported.
+"""
+import pytest # type: ignore
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("langchain_huggingface")
+pytest.importorskip("sentence_transformers")
+
+from services import embeddings # noqa: E402
+
+MIN_COSINE = 0.99
+
+
+def _load(factory):
+    try:
+        return factory()
+    except Exception as e:
+        pytest.skip(f"embedding model unavailable: {e}")
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return _load(lambda: embeddings.get_embedding_function("torch"))
+
+
+@pytest.mark.parametrize("quantize", [False, True], ids=["fp32", "int8"])
+def test_onnx_matches_torch_reference(reference, quantize):
+    onnx = _load(lambda: embeddings.OnnxEmbeddings(quantize=quantize))
+    assert embeddings.check_parity(min_cosine=MIN_COSINE, onnx=onnx) >= MIN_COSINE
@@ -0,0 +1,61 @@
+"""A send that fails after writing the user message releases its Idempotency-Key; the retry must not
+record the user message a second time."""
+import asyncio
+
+import pytest # type: ignore
+
+httpx = pytest.importorskip("httpx")
+
+import main # noqa: E402
+from api.v1.endpoints import sessions # noqa: E402
+from db import session as db_session # noqa: E402
+from db.base import Base # noqa: E402
+from db.migrations import add_missing_columns # noqa: E402
+from schemas.chat import AgentBudgetUsage, LLMOutputBlock, TextBlock # noqa: E402
+
+
+class _FlakyAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, agent_executor, user_input, chat_history, llm_instance, budget=None, user_id=None):
+        self.calls += 1
+        if self.calls == 2:  # the first send_message after the session's own greeting
+            raise RuntimeError("upstream LLM failed")
+        usage = AgentBudgetUsage(iterations=1, max_iterations=1, elapsed_seconds=0.0, max_seconds=1.0, total_tokens=0, max_tokens=1)
+        return LLMOutputBlock(blocks=[TextBlock(text="Answer.")]), [], usage
+
+
+async def _send_twice():
+    async with db_session.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        user = (await client.post("/api/v1/users/", json={"username": "idempotent-retry"})).json()
+        session = (await client.post("/api/v1/sessions/", json={"user_id": user["id"], "initial_message": "Hi"})).json()
+        body = {"session_id": session["id"], "user_id": user["id"], "content": "Once only"}
+        headers = {"Idempotency-Key": "retry-after-failure"}
+        failed = await client.post("/api/v1/sessions/chat", json=body, headers=headers)
+        retried = await client.post("/api/v1/sessions/chat", json=body, headers=headers)
+        replayed = await client.post("/api/v1/sessions/chat", json=body, headers=headers)
+        stored = (await client.get(f"/api/v1/sessions/{session['id']}")).json()
+    await db_session.engine.dispose()
+    return failed, retried, replayed, stored
+
+
+def test_retry_after_failure_writes_user_message_once(monkeypatch):
+    monkeypatch.setattr(sessions, "get_agent_response", _FlakyAgent())
+    main.app.dependency_overrides[sessions.get_agent_executor_dependency] = lambda: None
+    main.app.dependency_overrides[sessions.get_llm_instance_dependency] = lambda: None
+    try:
+        failed, retried, replayed, stored = asyncio.run(_send_twice())
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert replayed.json() == retried.json()
+    texts = [m["content"].get("text") for m in stored["messages"] if m["role"] == "user"]
+    assert texts == ["Hi", "Once only"]
+    assert stored["message_count"] == 4
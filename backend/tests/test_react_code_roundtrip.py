@@ -0,0 +1,68 @@
+"""ReactBlock code is stored once in code_blobs but still reaches clients: inline by default, or as a
+code_hash resolved through GET /blobs/{code_hash} when they ask for react_code=hash."""
+import asyncio
+
+import pytest # type: ignore
+
+httpx = pytest.importorskip("httpx")
+
+import main # noqa: E402
+from api.v1.endpoints import sessions # noqa: E402
+from db import session as db_session # noqa: E402
+from db.base import Base # noqa: E402
+from db.migrations import add_missing_columns # noqa: E402
+from schemas.chat import AgentBudgetUsage, LLMOutputBlock, ReactBlock, TextBlock # noqa: E402
+
+CODE = "const Chart = () => <div className=\"chart\">  42  </div>;\nrender(<Chart />);"
+
+
+async def _fake_agent_response(agent_executor, user_input, chat_history, llm_instance, budget=None, user_id=None):
+    output = LLMOutputBlock(blocks=[TextBlock(text="Here you go."), ReactBlock(description="A chart", code=CODE)])
+    usage = AgentBudgetUsage(iterations=1, max_iterations=1, elapsed_seconds=0.0, max_seconds=1.0, total_tokens=0, max_tokens=1)
+    return output, [], usage
+
+
+async def _roundtrip():
+    async with db_session.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        user = (await client.post("/api/v1/users/", json={"username": "react-roundtrip"})).json()
+        created = await client.post("/api/v1/sessions/", json={"user_id": user["id"], "initial_message": "Hi"})
+        session = created.json()
+        sent = await client.post("/api/v1/sessions/chat", json={"session_id": session["id"], "user_id": user["id"], "content": "Chart it"})
+        inline = await client.get(f"/api/v1/sessions/{session['id']}")
+        hashed = await client.get(f"/api/v1/sessions/{session['id']}", params={"react_code": "hash"})
+        react = hashed.json()["messages"][-1]["content"]["blocks"][1]
+        blob = await client.get(f"/api/v1/blobs/{react.get('code_hash')}")
+    await db_session.engine.dispose()
+    return created, sent, inline, hashed, blob
+
+
+def _react_block(message):
+    return message["content"]["blocks"][1]
+
+
+def test_react_code_roundtrip(monkeypatch):
+    monkeypatch.setattr(sessions, "get_agent_response", _fake_agent_response)
+    main.app.dependency_overrides[sessions.get_agent_executor_dependency] = lambda: None
+    main.app.dependency_overrides[sessions.get_llm_instance_dependency] = lambda: None
+    try:
+        created, sent, inline, hashed, blob = asyncio.run(_roundtrip())
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert created.status_code == 201
+    assert _react_block(created.json()["messages"][-1])["code"] == CODE
+    assert sent.status_code == 200
+    assert _react_block(sent.json()["ai_response"]) == {"block_type": "react", "description": "A chart", "code": CODE}
+    assert inline.status_code == 200
+    assert _react_block(inline.json()["messages"][-1]) == {"block_type": "react", "description": "A chart", "code": CODE}
+
+    assert hashed.status_code == 200
+    react = _react_block(hashed.json()["messages"][-1])
+    assert "code" not in react and react["code_hash"]
+    assert blob.status_code == 200
+    assert blob.text == CODE
+    assert blob.headers["etag"] == f'"{react["code_hash"]}"'
@@ -6,7 +6,7 @@ import './App.css';
 
 function App() {
     type TextBlock = { block_type: "text"; text: string; };
-    type ReactBlock = { block_type: "react"; description?: string; code: string; };
+    type ReactBlock = { block_type: "react"; description?: string; code?: string; code_hash?: string; };
     type LLMOutputBlock = { blocks: (TextBlock | ReactBlock)[]; };
 
     type ApiMessageContent = TextBlock | LLMOutputBlock; // Content can be a TextBlock or LLMOutputBlock
@@ -25,6 +25,9 @@ function App() {
         title: string;
         created_at: string;
         updated_at: string | null;
+        message_count?: number;
+        last_message_preview?: string | null;
+        last_message_at?: string | null;
         messages: ApiMessage[]; // Messages are now ApiMessage objects
     };
 
@@ -44,7 +47,7 @@ function App() {
     useEffect(() => {
         const fetchChatSessions = async () => {
             try {
-                const response = await fetch('http://localhost:8000/api/v1/sessions/user/2'); // Assuming user_id is 1
+                const response = await fetch('http://localhost:8000/api/v1/sessions/user/2', { credentials: 'include' }); // Assuming user_id is 1
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
@@ -88,8 +91,9 @@ function App() {
                     return;
                 }
 
-                // If not loaded, fetch from /api/v1/sessions/{session_id}
-                const response = await fetch(`http://localhost:8000/api/v1/sessions/${selectedChatId}`);
+                // If not loaded, fetch from /api/v1/sessions/{session_id}. MessageBubble resolves ReactBlock
+                // code_hash through the cached /api/v1/blobs endpoint, so ask for the hash-only shape.
+                const response = await fetch(`http://localhost:8000/api/v1/sessions/${selectedChatId}?react_code=hash`, { credentials: 'include' });
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
@@ -151,12 +155,22 @@ function App() {
         setInput('');
 
         try {
-            const payload = { query: input, chatId: selectedChatId };
-            const response = await fetch('http://localhost:8000/chat', {
+            const payload = { session_id: selectedChatId, user_id: 2, content: input }; // Assuming user_id is 2
+            // One key per submit: a resend of this message (the retry below, a proxy retry) replays the
+            // stored response instead of writing the message and running the agent a second time
+            const request: RequestInit = {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'Idempotency-Key': crypto.randomUUID() },
+                credentials: 'include',
                 body: JSON.stringify(payload),
-            });
+            };
+            let response: Response;
+            try {
+                response = await fetch('http://localhost:8000/api/v1/sessions/chat', request);
+            } catch {
+                // Network failure: the server may or may not have received it, so resend with the same key
+                response = await fetch('http://localhost:8000/api/v1/sessions/chat', request);
+            }
 
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
@@ -222,6 +236,7 @@ function App() {
 
             const response = await fetch('http://localhost:8000/api/v1/sessions/', {
                 method: 'POST',
+                credentials: 'include', // Keeps the last-write cookie so the next reads skip a lagging replica
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload),
             });
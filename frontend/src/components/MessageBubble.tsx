@@ -1,4 +1,4 @@
-import React, { useEffect, useRef, type CSSProperties } from 'react'
+import React, { useEffect, useRef, useState, type CSSProperties } from 'react'
 import ReactMarkdown, { type Components } from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import { Prism as SyntaxHighlighter } from 'react-syntax-highlighter';
@@ -9,11 +9,42 @@ import * as Babel from '@babel/standalone';
 Chart.register(...registerables);
 
 interface TextBlock { block_type: "text"; text: string; }
-interface ReactBlock { block_type: "react"; description?: string; code: string; }
+// The API sends code_hash in place of code; the code itself is fetched once per hash
+interface ReactBlock { block_type: "react"; description?: string; code?: string; code_hash?: string; }
 interface LLMOutputBlock { blocks: (TextBlock | ReactBlock)[]; }
 
 type ApiMessageContent = TextBlock | LLMOutputBlock; // Content can be a TextBlock or LLMOutputBlock
 
+// Component code is content-addressed, so a hash can be cached for the lifetime of the page
+const componentCodeCache = new Map<string, Promise<string>>();
+
+const fetchComponentCode = (hash: string): Promise<string> => {
+  let code = componentCodeCache.get(hash);
+  if (!code) {
+    code = fetch(`http://localhost:8000/api/v1/blobs/${hash}`).then(response => {
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      return response.text();
+    });
+    code.catch(() => componentCodeCache.delete(hash)); // Retry on the next render
+    componentCodeCache.set(hash, code);
+  }
+  return code;
+};
+
+const resolveComponentCode = async (content: ApiMessageContent): Promise<ApiMessageContent> => {
+  if (!('blocks' in content) || !content.blocks.some(block => block.block_type === 'react' && block.code === undefined)) {
+    return content;
+  }
+  const blocks = await Promise.all(content.blocks.map(async block =>
+    block.block_type === 'react' && block.code === undefined && block.code_hash
+      ? { ...block, code: await fetchComponentCode(block.code_hash) }
+      : block
+  ));
+  return { ...content, blocks };
+};
+
 interface Message {
     msg: {
         content: ApiMessageContent;
@@ -30,6 +61,18 @@ interface CodeComponentProps {
 const MessageBubble: React.FC<Message> = ({ msg }) => {
   const chartRef = useRef<HTMLCanvasElement>(null);
   const chartInstance = useRef<Chart | null>(null);
+  const [content, setContent] = useState<ApiMessageContent>(msg.content);
+
+  useEffect(() => {
+    let cancelled = false;
+    setContent(msg.content);
+    if (msg.content) {
+      resolveComponentCode(msg.content)
+        .then(resolved => { if (!cancelled) setContent(resolved); })
+        .catch(error => console.error("Error fetching component code:", error));
+    }
+    return () => { cancelled = true; };
+  }, [msg.content]);
 
   // Ensure msg.content is not undefined before proceeding
   if (!msg.content) {
@@ -53,12 +96,12 @@ const MessageBubble: React.FC<Message> = ({ msg }) => {
   };
 
   useEffect(() => {
-    if ('blocks' in msg.content) {
+    if ('blocks' in content) {
       let chartCode = '';
       let reactComponentCode = '';
 
-      for (const block of msg.content.blocks) {
-        if (block.block_type === 'react') {
+      for (const block of content.blocks) {
+        if (block.block_type === 'react' && block.code !== undefined) {
           reactComponentCode = block.code;
           // For now, we'll assume react blocks might contain chart.js code
           // In a more sophisticated setup, you'd parse or have a specific block type for charts
@@ -98,7 +141,7 @@ const MessageBubble: React.FC<Message> = ({ msg }) => {
         }
       }
     }
-  }, [msg.content]);
+  }, [content]);
 
   const components: Components = {
     code({ inline, className, children }: CodeComponentProps) {
@@ -124,8 +167,8 @@ const MessageBubble: React.FC<Message> = ({ msg }) => {
         className={`message-row ${msg.role}`}
     >
         <div className="message-bubble">
-            {'blocks' in msg.content ? (
-                msg.content.blocks.map((block, index) => {
+            {'blocks' in content ? (
+                content.blocks.map((block, index) => {
                     if (block.block_type === 'text') {
                         return (
                             <ReactMarkdown
@@ -137,11 +180,15 @@ const MessageBubble: React.FC<Message> = ({ msg }) => {
                             </ReactMarkdown>
                         );
                     } else if (block.block_type === 'react') {
+                        const code = block.code;
+                        if (code === undefined) {
+                            return <p key={index}>Loading component...</p>;
+                        }
                         // Dynamically render React component from code string
                         const DynamicComponent = () => {
                             try {
                                 // Transpile JSX to React.createElement calls
-                                const transpiledCode = Babel.transform(block.code, {
+                                const transpiledCode = Babel.transform(code, {
                                     presets: ['react', 'env']
                                 }).code;
 
@@ -170,10 +217,10 @@ const MessageBubble: React.FC<Message> = ({ msg }) => {
                     remarkPlugins={[remarkGfm]}
                     components={components}
                 >
-                    {'text' in msg.content ? msg.content.text : ''}
+                    {'text' in content ? content.text : ''}
                 </ReactMarkdown>
             )}
-            {'blocks' in msg.content && msg.content.blocks.some(block => block.block_type === 'react') && (
+            {'blocks' in content && content.blocks.some(block => block.block_type === 'react') && (
                 <canvas ref={chartRef} id="myChart" width="800" height="400"></canvas>
             )}
         </div>
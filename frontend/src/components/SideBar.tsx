@@ -21,6 +21,9 @@ interface ChatSession {
     title: string;
     created_at: string;
     updated_at: string | null;
+    message_count?: number;
+    last_message_preview?: string | null;
+    last_message_at?: string | null;
     messages: ApiMessage[]; // Messages are now ApiMessage objects
 }
 
@@ -60,7 +63,12 @@ const SideBar: React.FC<SideBarProps> = ({ isSidebarOpen, setIsSidebarOpen, chat
                         {Object.keys(chatHistory).map((chatId) => (
                             <div key={chatId} className={`chat-history-item ${selectedChatId === chatId ? 'selected' : ''}`} onClick={() => handleChatSelection(chatId)}>
                                 <MessageSquareTextIcon size={16} />
-                                <span className="chat-history-item-text">{getChatTitle(chatId)}</span>
+                                <div className="chat-history-item-body">
+                                    <span className="chat-history-item-text">{getChatTitle(chatId)}</span>
+                                    {chatHistory[chatId].last_message_preview && (
+                                        <span className="chat-history-item-preview">{chatHistory[chatId].last_message_preview}</span>
+                                    )}
+                                </div>
                             </div>
                         ))}
                     </div>